@@ -2,19 +2,26 @@
 """patchlint — automate kernel patch warning testing and generate test blurbs."""
 from __future__ import annotations
 
+import codecs
+import errno
+import fcntl
+import hashlib
+import io
+import mmap
 import os
 import re
+import select
 import signal
 import shutil
 import subprocess
 import sys
 import tempfile
 import threading
-from collections import deque
-from concurrent.futures import ThreadPoolExecutor, Future
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import contextmanager, ExitStack
 from pathlib import Path
-from typing import IO, Iterable, Iterator
+from typing import IO, Callable, Iterable, Iterator, TypeVar
 
 import click
 
@@ -23,8 +30,8 @@ import click
 # ---------------------------------------------------------------------------
 
 _shutdown = threading.Event()
-_child_procs: list[subprocess.Popen[str]] = []
-_child_pids: list[int] = []  # raw pids from os.forkpty()
+_child_procs: list[subprocess.Popen[bytes]] = []
+_child_pidfds: list[int] = []  # pidfds for children from os.forkpty()
 _child_procs_lock = threading.Lock()
 
 
@@ -37,9 +44,9 @@ def _sigint_handler(signum: int, frame: object) -> None:
                 os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
             except (ProcessLookupError, OSError):
                 pass
-        for pid in _child_pids:
+        for pidfd in _child_pidfds:
             try:
-                os.kill(pid, signal.SIGTERM)
+                signal.pidfd_send_signal(pidfd, signal.SIGTERM)
             except (ProcessLookupError, OSError):
                 pass
     click.secho("\n⚠️  Interrupted — cleaning up worktrees...", fg="yellow", err=True)
@@ -51,44 +58,173 @@ def _sigint_handler(signum: int, frame: object) -> None:
 
 ANSI_RE = re.compile(r"\x1B\[[0-9;]*[A-Za-z]")
 
+def _strip_ansi(s: str) -> str:
+    # Non-TTY/CI logs usually carry no escapes; a memchr beats a regex pass.
+    return ANSI_RE.sub("", s) if "\x1b" in s else s
+
+
 # Match gcc/clang format:  file.c:123:45: warning: msg [-Wflag]
 # Match make format:       Makefile:15: warning: msg
-COMPILER_WARNING_RE = re.compile(
-    r"\S+:\d+(?::\d+)?:\s+warning:",
-    re.IGNORECASE,
-)
+# Case-sensitive: all of these emit a lowercase "warning:", and IGNORECASE
+# makes the regex engine fold every character it compares.
+COMPILER_WARNING_RE = re.compile(r"\S+:\d+(?::\d+)?:\s+warning:")
+
+# Collapses both "file:LINE:COL: warning:" and "file:LINE: warning:" in one pass.
+_LOC_RE = re.compile(r":(\d+)(:\d+)?(\s*:\s*warning:)")
+_WS_RE = re.compile(r"\s+")
+_DOT_SLASH_RE = re.compile(r"(^|\s)\./")
+
+
+def _loc_repl(m: re.Match[str]) -> str:
+    return (":LINE:COL" if m.group(2) else ":LINE") + m.group(3)
 
-WARNING_LOC_COLON_RE = re.compile(r":[0-9]+(:[0-9]+)(\s*:\s*warning:)", re.IGNORECASE)
-WARNING_LOC_LINE_RE = re.compile(r":[0-9]+(\s*:\s*warning:)", re.IGNORECASE)
+
+def _normalize_stripped(s: str) -> str:
+    """Normalize an already ANSI-stripped warning line."""
+    s = _WS_RE.sub(" ", s).rstrip()
+    s = _DOT_SLASH_RE.sub(r"\1", s)
+    return _LOC_RE.sub(_loc_repl, s)
 
 
 def normalize_warning_line(line: str) -> str:
     """Normalize a warning line for comparison: strip ANSI, collapse whitespace, normalize locations."""
-    s = ANSI_RE.sub("", line)
-    s = re.sub(r"\s+", " ", s).rstrip()
-    s = re.sub(r"(^|\s)\./", r"\1", s)
-    s = WARNING_LOC_COLON_RE.sub(r":LINE:COL\2", s)
-    s = WARNING_LOC_LINE_RE.sub(r":LINE\1", s)
-    return s
+    return _normalize_stripped(_strip_ansi(line))
 
 
-def extract_normalized_warnings(lines: Iterable[str]) -> list[str]:
-    """Extract and deduplicate normalized warning lines."""
-    out: set[str] = set()
+def _iter_warnings(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the normalized form of every warning line in *lines*."""
     for raw in lines:
-        clean = ANSI_RE.sub("", raw)
+        # Cheap substring test first: only a tiny fraction of build output
+        # lines are warnings, so most lines never reach the regexes.
+        if "warning:" not in raw:
+            continue
+        clean = _strip_ansi(raw)
         if COMPILER_WARNING_RE.search(clean):
-            out.add(normalize_warning_line(raw))
-    return sorted(out)
+            yield _normalize_stripped(clean)
+
+
+def extract_normalized_warnings(lines: Iterable[str]) -> list[str]:
+    """Extract and deduplicate normalized warning lines."""
+    return sorted(set(_iter_warnings(lines)))
+
+
+def _warning_digest(warning: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(warning.encode(), digest_size=8).digest(), "little"
+    )
+
+
+def _warning_digests(lines: Iterable[str]) -> set[int]:
+    """Deduplicate warnings in *lines* by 64-bit digest.
+
+    Comparing logs only needs warning identity, so the baseline keeps just
+    the digests.
+    """
+    return {_warning_digest(w) for w in _iter_warnings(lines)}
+
+
+def _warning_texts(lines: Iterable[str]) -> dict[int, str]:
+    """Map the digest of each warning in *lines* to its normalized text.
+
+    Used for the candidate, whose new warnings get reported.
+    """
+    return {_warning_digest(w): w for w in _iter_warnings(lines)}
+
+
+# The result of _warning_digests or _warning_texts; the log scanners below
+# return whichever of the two they were given.
+_Warnings = TypeVar("_Warnings", set[int], dict[int, str])
+
+
+# Logs larger than this are scanned in worker processes rather than threads,
+# since the regex work holds the GIL.
+PROCESS_SCAN_THRESHOLD = 32 << 20  # bytes
+# Logs larger than this are additionally split into per-core chunks.
+PARALLEL_SCAN_THRESHOLD = 64 << 20  # bytes
+
+
+def _log_warnings(
+    log_path: Path, collect: Callable[[Iterable[str]], _Warnings],
+) -> _Warnings:
+    with log_path.open(errors="replace") as fh:
+        return collect(fh)
+
+
+def _scan_log_slice(
+    log_path: Path, start: int, end: int,
+    collect: Callable[[Iterable[str]], _Warnings],
+) -> _Warnings:
+    """Return the warnings for bytes [start, end) of *log_path*.
+
+    Lines are prefiltered as bytes so only candidate warnings get decoded.
+    """
+    with log_path.open("rb") as fh, \
+         mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return collect(
+            raw.decode(errors="replace")
+            for raw in mm[start:end].splitlines()
+            if b"warning:" in raw
+        )
+
+
+def _log_chunks(log_path: Path, n: int) -> list[tuple[int, int]]:
+    """Split *log_path* into at most *n* byte ranges ending on newlines."""
+    size = log_path.stat().st_size
+    if size == 0:
+        return []
+    bounds = [0]
+    with log_path.open("rb") as fh, \
+         mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, n):
+            nl = mm.find(b"\n", max(size * i // n, bounds[-1]))
+            if nl < 0:
+                break
+            if nl + 1 > bounds[-1]:
+                bounds.append(nl + 1)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _log_warnings_parallel(
+    log_path: Path, collect: Callable[[Iterable[str]], _Warnings],
+) -> _Warnings:
+    """Scan *log_path* in newline-aligned chunks across all cores."""
+    chunks = _log_chunks(log_path, os.cpu_count() or 1)
+    out = collect(())
+    with ProcessPoolExecutor() as pool:
+        futs = [
+            pool.submit(_scan_log_slice, log_path, start, end, collect)
+            for start, end in chunks
+        ]
+        for fut in futs:
+            out.update(fut.result())
+    return out
 
 
 def compare_warnings(baseline: Path, candidate: Path) -> list[str]:
-    """Compare two log files and return a sorted list of new warnings in candidate."""
-    with baseline.open(errors="replace") as fh:
-        base_warnings = extract_normalized_warnings(fh)
-    with candidate.open(errors="replace") as fh:
-        cand_warnings = extract_normalized_warnings(fh)
-    return sorted(set(cand_warnings) - set(base_warnings))
+    """Compare two log files and return a sorted list of new warnings in candidate.
+
+    Both logs are scanned concurrently; very large logs are also split into
+    chunks scanned in parallel.
+    """
+    largest = max(baseline.stat().st_size, candidate.stat().st_size)
+    if largest > PARALLEL_SCAN_THRESHOLD:
+        # Each scan already fans out across every core; run them in turn.
+        base_warnings = _log_warnings_parallel(baseline, _warning_digests)
+        cand_warnings = _log_warnings_parallel(candidate, _warning_texts)
+    else:
+        pool: Executor
+        if largest > PROCESS_SCAN_THRESHOLD:
+            pool = ProcessPoolExecutor(max_workers=2)
+        else:
+            pool = ThreadPoolExecutor(max_workers=2)
+        with pool:
+            base_fut = pool.submit(_log_warnings, baseline, _warning_digests)
+            cand_fut = pool.submit(_log_warnings, candidate, _warning_texts)
+            base_warnings = base_fut.result()
+            cand_warnings = cand_fut.result()
+    return sorted(cand_warnings[k] for k in cand_warnings.keys() - base_warnings)
 
 
 # ---------------------------------------------------------------------------
@@ -96,25 +232,43 @@ def compare_warnings(baseline: Path, candidate: Path) -> list[str]:
 # ---------------------------------------------------------------------------
 
 
-def _spawn(cmd: list[str], *, cwd: Path | None = None) -> subprocess.Popen[str]:
+PIPE_SIZE = 1 << 20  # bytes
+
+
+def _grow_pipe(pipe: IO[bytes]) -> None:
+    """Enlarge the kernel buffer of *pipe* so chatty builds block less often."""
+    try:
+        fcntl.fcntl(pipe.fileno(), fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+    except (AttributeError, OSError):
+        # Not Linux, or above /proc/sys/fs/pipe-max-size for this user.
+        pass
+
+
+def _spawn(
+    cmd: list[str], *, cwd: Path | None = None, env: dict[str, str] | None = None,
+) -> subprocess.Popen[bytes]:
     """Spawn a subprocess in its own process group and track it for cleanup."""
     if _shutdown.is_set():
         raise KeyboardInterrupt
     proc = subprocess.Popen(
         cmd,
         cwd=str(cwd) if cwd else None,
+        env=env,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
+        # Raw binary pipe: output is forwarded to logs as-is (see
+        # _copy_pipe), so neither decoding nor a userspace buffer helps.
+        bufsize=0,
         start_new_session=True,
     )
+    assert proc.stdout is not None
+    _grow_pipe(proc.stdout)
     with _child_procs_lock:
         _child_procs.append(proc)
     return proc
 
 
-def _reap(proc: subprocess.Popen[str]) -> int:
+def _reap(proc: subprocess.Popen[bytes]) -> int:
     """Wait for process and untrack it."""
     rc = proc.wait()
     with _child_procs_lock:
@@ -125,12 +279,45 @@ def _reap(proc: subprocess.Popen[str]) -> int:
     return rc
 
 
-def run_and_log(cmd: list[str], log_fh: IO[str], *, cwd: Path | None = None) -> int:
-    """Run *cmd*, writing output only to *log_fh* (no stderr — safe for parallel use)."""
-    proc = _spawn(cmd, cwd=cwd)
+def _copy_pipe(src: IO[bytes], dst: IO[bytes]) -> None:
+    """Copy pipe *src* into *dst* until EOF.
+
+    On Linux the data is moved with splice(2) so it never passes through
+    userspace; otherwise (or if *dst* does not support splice) fall back to
+    a block copy.
+    """
+    if hasattr(os, "splice"):
+        try:
+            in_fd, out_fd = src.fileno(), dst.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            pass
+        else:
+            dst.flush()
+            try:
+                while os.splice(in_fd, out_fd, 1 << 20):
+                    pass
+                return
+            except OSError as exc:
+                if exc.errno not in (errno.EINVAL, errno.ENOSYS):
+                    raise
+    shutil.copyfileobj(src, dst, 65536)
+
+
+def run_and_log(
+    cmd: list[str],
+    log_fh: IO[bytes],
+    *,
+    cwd: Path | None = None,
+    env: dict[str, str] | None = None,
+) -> int:
+    """Run *cmd*, writing output only to *log_fh* (no stderr — safe for parallel use).
+
+    Output is copied to the log in raw blocks (see _copy_pipe); it is never
+    split into lines or decoded.
+    """
+    proc = _spawn(cmd, cwd=cwd, env=env)
     assert proc.stdout is not None
-    for line in iter(proc.stdout.readline, ''):
-        log_fh.write(line)
+    _copy_pipe(proc.stdout, log_fh)
     return _reap(proc)
 
 
@@ -145,38 +332,27 @@ def run_capture(cmd: list[str], *, cwd: Path | None = None) -> str:
 # ---------------------------------------------------------------------------
 
 
-def check_git_repo(kernel_dir: Path) -> None:
-    """Raise UsageError if *kernel_dir* is not inside a git repository."""
+def check_clean_repo(kernel_dir: Path) -> None:
+    """Raise UsageError if *kernel_dir* is not a git repository or has uncommitted changes.
+
+    A single ``git status`` answers both: it fails outside a repository,
+    and lists an entry for every staged or unstaged change to tracked files.
+    """
     try:
-        subprocess.run(
-            ["git", "rev-parse", "--git-dir"],
+        result = subprocess.run(
+            ["git", "--no-optional-locks", "status",
+             "--porcelain=v2", "--untracked-files=no", "-z"],
             cwd=str(kernel_dir),
             check=True,
             capture_output=True,
         )
     except (subprocess.CalledProcessError, FileNotFoundError) as exc:
         raise click.UsageError(f"{kernel_dir} is not a git repository") from exc
-
-
-def check_clean_tree(kernel_dir: Path) -> None:
-    """Raise UsageError if the working tree has uncommitted changes."""
-    try:
-        subprocess.run(
-            ["git", "diff", "--quiet"],
-            cwd=str(kernel_dir),
-            check=True,
-            capture_output=True,
-        )
-        subprocess.run(
-            ["git", "diff", "--cached", "--quiet"],
-            cwd=str(kernel_dir),
-            check=True,
-            capture_output=True,
-        )
-    except subprocess.CalledProcessError as exc:
+    # Entries start with "1 ", "2 " or "u "; "# " lines are headers.
+    if any(not f.startswith(b"#") for f in result.stdout.split(b"\0") if f):
         raise click.UsageError(
             "Working tree is dirty — commit or stash changes first"
-        ) from exc
+        )
 
 
 def check_vng() -> None:
@@ -185,22 +361,188 @@ def check_vng() -> None:
         raise click.UsageError("vng (virtme-ng) not found on PATH")
 
 
+def resolve_revs_short(kernel_dir: Path, *revs: str) -> list[str]:
+    """Resolve each of *revs* to a 12-character hash with a single git call.
+
+    ``rev-parse --short`` only accepts one revision, so the revisions are
+    fed to ``cat-file --batch-check`` instead.  Raises CalledProcessError
+    naming the first revision that does not resolve.
+    """
+    cmd = ["git", "cat-file", "--batch-check=%(objectname)"]
+    result = subprocess.run(
+        cmd,
+        cwd=str(kernel_dir),
+        input="".join(f"{rev}\n" for rev in revs),
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    hashes = result.stdout.splitlines()
+    for rev, line in zip(revs, hashes):
+        if " " in line:  # "<rev> missing" / "<rev> ambiguous"
+            raise subprocess.CalledProcessError(
+                128, cmd, stderr=f"fatal: bad revision '{rev}'\n"
+            )
+    return [h[:12] for h in hashes]
+
+
 def resolve_rev_short(kernel_dir: Path, rev: str) -> str:
     """Resolve *rev* to a short commit hash."""
-    return run_capture(
-        ["git", "rev-parse", "--short=12", rev], cwd=kernel_dir
-    ).strip()
+    return resolve_revs_short(kernel_dir, rev)[0]
+
+
+def _git_z(
+    cwd: Path, *args: str, stdin: str | None = None, check: bool = True,
+) -> list[str]:
+    """Run ``git *args*`` in *cwd* and return its NUL-separated output fields."""
+    result = subprocess.run(
+        ["git", *args],
+        cwd=str(cwd),
+        input=stdin,
+        check=check,
+        capture_output=True,
+        text=True,
+    )
+    return [f for f in result.stdout.split("\0") if f]
+
+
+def _clone_file(src: Path, dst: Path) -> None:
+    """Copy regular file *src* to new file *dst*, keeping its permission bits.
+
+    copy_file_range(2) shares extents on filesystems with reflinks (btrfs,
+    XFS) and otherwise copies inside the kernel.  Unlike a hardlink, the
+    copy has its own inode, so edits to the main tree made during a build
+    cannot leak into it.  Raises OSError for symlinks, when the copy
+    cannot be done in-kernel (e.g. across filesystems on older kernels) and
+    when *src* ends early, leaving *dst* short.
+    """
+    sfd = os.open(src, os.O_RDONLY | os.O_NOFOLLOW)
+    try:
+        st = os.fstat(sfd)
+        size = st.st_size
+        dfd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, st.st_mode & 0o777)
+        try:
+            while size > 0:
+                n = os.copy_file_range(sfd, dfd, size)
+                if n == 0:
+                    raise OSError(errno.EIO, "short copy", str(src))
+                size -= n
+        finally:
+            os.close(dfd)
+    finally:
+        os.close(sfd)
+
+
+def _populate_worktree(kernel_dir: Path, wt: Path) -> None:
+    """Fill *wt*, created with ``--no-checkout``, with the files of its HEAD.
+
+    Files identical between *wt*'s HEAD and *kernel_dir*'s HEAD are cloned
+    from the (clean) main tree with _clone_file instead of being inflated
+    from the object store again; only the differing files are checked out.
+    """
+    rev = run_capture(["git", "rev-parse", "HEAD"], cwd=wt).strip()
+    _git_z(wt, "read-tree", rev)
+    status = _git_z(
+        kernel_dir, "diff", "--name-status", "--no-renames", "-z", rev, "HEAD"
+    )
+    changed = dict(zip(status[1::2], status[0::2]))
+    # Paths present at rev but differing from (or absent in) the main tree.
+    checkout = [path for path, st in changed.items() if st != "A"]
+
+    made_dirs: set[Path] = set()
+    for path in _git_z(kernel_dir, "ls-files", "-z"):
+        if path in changed:
+            continue
+        dst = wt / path
+        if dst.parent not in made_dirs:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            made_dirs.add(dst.parent)
+        try:
+            _clone_file(kernel_dir / path, dst)
+        except OSError:
+            # Symlink, no in-kernel copy across these filesystems, missing
+            # from a sparse main tree, ...: let git write it.
+            checkout.append(path)
+
+    if checkout:
+        _checkout_paths(wt, checkout)
+    # read-tree leaves no stat data in the index, so every later status in
+    # the worktree (setlocalversion runs one per build) would re-hash the
+    # whole tree.  Record it once now.  Files that do not match the index
+    # (the main tree changed underneath a clone) are left unrefreshed; let
+    # git write those, then refresh again and fail if any still differ.
+    _git_z(wt, "update-index", "--refresh", check=False)
+    stale = _git_z(wt, "diff-files", "--name-only", "-z")
+    if stale:
+        _checkout_paths(wt, stale)
+        _git_z(wt, "update-index", "--refresh")
+
+
+def _checkout_paths(wt: Path, paths: list[str]) -> None:
+    """Write *paths* in *wt* from its index, replacing whatever is there."""
+    _git_z(
+        wt, "checkout-index", "-f", "-z", "--stdin",
+        stdin="".join(f"{path}\0" for path in paths),
+    )
+
+
+def _work_dir(kernel_dir: Path) -> Path:
+    """Return the per-repository directory for patchlint's worktrees and builds.
+
+    Its paths are the same on every run, so with CCACHE_BASEDIR pointing
+    here the compiler sees the same arguments from one run to the next.
+    """
+    return kernel_dir.parent / f".patchlint-{kernel_dir.name}"
 
 
 @contextmanager
-def git_worktree(kernel_dir: Path, rev: str) -> Iterator[Path]:
-    """Create a detached worktree for *rev*, yield its path, remove on exit."""
+def _locked_work_dir(kernel_dir: Path) -> Iterator[Path]:
+    """Create and lock *kernel_dir*'s work directory for the length of a run."""
+    work = _work_dir(kernel_dir)
+    work.mkdir(exist_ok=True)
+    with (work / "lock").open("w") as lock_fh:
+        try:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise click.ClickException(
+                f"another patchlint run is using {work}"
+            ) from None
+        yield work
+
+
+def _discard_worktree(kernel_dir: Path, wt: Path) -> None:
+    """Remove whatever an interrupted run left at *wt*."""
+    if wt.exists():
+        subprocess.run(
+            ["git", "worktree", "remove", "--force", str(wt)],
+            cwd=str(kernel_dir),
+            capture_output=True,
+        )
+        shutil.rmtree(wt, ignore_errors=True)
+    # Forget registrations whose directory is gone, or "add" refuses the path.
+    subprocess.run(
+        ["git", "worktree", "prune"], cwd=str(kernel_dir), capture_output=True,
+    )
+
+
+@contextmanager
+def git_worktree(kernel_dir: Path, rev: str, path: Path | None = None) -> Iterator[Path]:
+    """Create a detached worktree for *rev*, yield its path, remove on exit.
+
+    The worktree is created at *path* (replacing any leftover there), or at
+    a fresh temporary directory next to *kernel_dir*.
+    """
     # Place worktrees on the same filesystem as the kernel tree to avoid
     # filling up tmpfs — allmodconfig/allyesconfig builds are very large.
-    wt = Path(tempfile.mkdtemp(prefix="patchlint-", dir=str(kernel_dir.parent)))
+    # Same filesystem also lets _populate_worktree reflink unchanged files.
+    if path is None:
+        wt = Path(tempfile.mkdtemp(prefix="patchlint-", dir=str(kernel_dir.parent)))
+    else:
+        wt = path
+        _discard_worktree(kernel_dir, wt)
     try:
         subprocess.run(
-            ["git", "worktree", "add", "--detach", str(wt), rev],
+            ["git", "worktree", "add", "--detach", "--no-checkout", str(wt), rev],
             cwd=str(kernel_dir),
             check=True,
             capture_output=True,
@@ -213,6 +555,13 @@ def git_worktree(kernel_dir: Path, rev: str) -> Iterator[Path]:
             msg += f"\n{exc.stderr.strip()}"
         raise click.ClickException(msg) from exc
     try:
+        try:
+            _populate_worktree(kernel_dir, wt)
+        except subprocess.CalledProcessError as exc:
+            msg = f"failed to check out worktree for {rev}"
+            if exc.stderr:
+                msg += f"\n{exc.stderr.strip()}"
+            raise click.ClickException(msg) from exc
         yield wt
     finally:
         rm_result = subprocess.run(
@@ -248,35 +597,38 @@ def run_checkpatch(kernel_dir: Path, baseline: str) -> None:
 
     click.secho("📋 Running checkpatch...", fg="yellow", err=True)
 
-    git_proc = subprocess.Popen(
-        ["git", "format-patch", "--stdout", f"{baseline}..HEAD"],
-        cwd=str(kernel_dir),
-        stdout=subprocess.PIPE,
-    )
-    cp_proc = subprocess.Popen(
-        [str(checkpatch), "-"],
-        cwd=str(kernel_dir),
-        stdin=git_proc.stdout,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-    )
-    # Allow git_proc to receive SIGPIPE if checkpatch exits early.
-    assert git_proc.stdout is not None
-    git_proc.stdout.close()
+    # checkpatch writes straight to an unnamed temp file, so a long series'
+    # report is never held in memory and is only read back on failure.
+    with tempfile.TemporaryFile() as out_fh:
+        git_proc = subprocess.Popen(
+            ["git", "format-patch", "--stdout", f"{baseline}..HEAD"],
+            cwd=str(kernel_dir),
+            stdout=subprocess.PIPE,
+        )
+        cp_proc = subprocess.Popen(
+            [str(checkpatch), "-"],
+            cwd=str(kernel_dir),
+            stdin=git_proc.stdout,
+            stdout=out_fh,
+            stderr=subprocess.STDOUT,
+        )
+        # Allow git_proc to receive SIGPIPE if checkpatch exits early.
+        assert git_proc.stdout is not None
+        git_proc.stdout.close()
 
-    assert cp_proc.stdout is not None
-    output = cp_proc.stdout.read()
-    cp_proc.wait()
-    git_proc.wait()
+        cp_proc.wait()
+        git_proc.wait()
 
-    if cp_proc.returncode != 0:
-        click.secho(
-            "❌ checkpatch failed — fix issues before continuing",
-            fg="red", err=True,
-        )
-        click.echo(output, err=True, nl=False)
-        sys.exit(2)
+        if cp_proc.returncode != 0:
+            click.secho(
+                "❌ checkpatch failed — fix issues before continuing",
+                fg="red", err=True,
+            )
+            out_fh.seek(0)
+            blocks = iter(lambda: out_fh.read(65536), b"")
+            for text in codecs.iterdecode(blocks, "utf-8", errors="replace"):
+                click.echo(text, err=True, nl=False)
+            sys.exit(2)
 
     click.secho("✅ checkpatch passed", fg="green", err=True)
 
@@ -288,33 +640,78 @@ def run_checkpatch(kernel_dir: Path, baseline: str) -> None:
 WARN_CONFIGS = ("allmodconfig", "allyesconfig")
 
 
-def build_config(log_path: Path, kernel_dir: Path, config_name: str) -> int:
-    """Build *config_name* in *kernel_dir*, writing full output to *log_path*.
+def _ccache_env(bin_dir: Path, base_dir: Path) -> dict[str, str] | None:
+    """Return a build environment that compiles through ccache, or None without it.
 
-    Always cleans first to ensure a known-good starting state.
+    ``gcc``/``cc`` symlinks to ccache in *bin_dir* are put first on PATH, so
+    every compiler invocation is cached whatever CC vng/make pick.
+    ccache rewrites absolute paths under *base_dir* relative to the compiler's
+    working directory; that only yields hits across runs if the worktrees
+    and build directories below *base_dir* keep their names (see _work_dir).
+    The build timestamp is pinned too, so objects that embed it (init/version.o
+    and its dependents) hit as well.
+    """
+    ccache = shutil.which("ccache")
+    if not ccache:
+        return None
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    for cc in ("gcc", "cc"):
+        link = bin_dir / cc
+        link.unlink(missing_ok=True)
+        link.symlink_to(ccache)
+    return {
+        **os.environ,
+        "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        "CCACHE_BASEDIR": str(base_dir),
+        "CCACHE_NOHASHDIR": "1",
+        "KBUILD_BUILD_TIMESTAMP": "@0",
+    }
+
+
+def _fresh_build_dir(build_dir: Path) -> None:
+    """Empty *build_dir* (the ``O=`` output directory) for a from-scratch build."""
+    shutil.rmtree(build_dir, ignore_errors=True)
+    build_dir.mkdir(parents=True)
+
+
+def build_config(
+    log_path: Path,
+    kernel_dir: Path,
+    config_name: str,
+    build_dir: Path,
+    env: dict[str, str] | None = None,
+) -> int:
+    """Build *config_name* from *kernel_dir* into *build_dir*, logging to *log_path*.
+
+    Builds out of tree (``make O=``) so several configs can be built from
+    one source worktree at once.  Always starts from an empty *build_dir*
+    to ensure a known-good starting state.
     Uses ``make KCFLAGS=-Wno-error`` to ensure warnings are never promoted to
-    errors, regardless of CONFIG_WERROR.
+    errors, regardless of CONFIG_WERROR.  *env* (default: inherited) is
+    passed to every command.
     """
     log_path.parent.mkdir(parents=True, exist_ok=True)
+    _fresh_build_dir(build_dir)
+    out = f"O={build_dir}"
     header = [
         "build-log mode",
         f"log={log_path}",
         f"kernel_dir={kernel_dir}",
+        f"build_dir={build_dir}",
         f"config={config_name}",
     ]
     commands = [
-        ["vng", "--clean"],
-        ["make", config_name],
-        ["./scripts/config", "-d", "WERROR"],
-        ["make", "olddefconfig"],
-        ["vng", "--build", "--skip-config", "KCFLAGS=-Wno-error"],
+        ["make", out, config_name],
+        ["./scripts/config", "--file", str(build_dir / ".config"), "-d", "WERROR"],
+        ["make", out, "olddefconfig"],
+        ["vng", "--build", "--skip-config", out, "KCFLAGS=-Wno-error"],
     ]
-    with log_path.open("w", encoding="utf-8") as log_fh:
+    with log_path.open("wb") as log_fh:
         for line in header:
-            log_fh.write(f"# {line}\n")
+            log_fh.write(f"# {line}\n".encode())
         for cmd in commands:
-            log_fh.write(f"# cmd: {' '.join(cmd)}\n")
-            rc = run_and_log(cmd, log_fh, cwd=kernel_dir)
+            log_fh.write(f"# cmd: {' '.join(cmd)}\n".encode())
+            rc = run_and_log(cmd, log_fh, cwd=kernel_dir, env=env)
             if rc != 0:
                 return rc
     return 0
@@ -355,35 +752,52 @@ def _run_vng_boot(kernel_dir: Path) -> tuple[int, str]:
             pass
         os._exit(127)
 
-    # Parent — track pid for Ctrl-C cleanup.
+    # Parent — a pidfd refers to this exact child (no PID-reuse races) and
+    # becomes readable when it exits, so one poll() covers output, exit and
+    # BOOT_TIMEOUT without a watchdog thread.
+    try:
+        pidfd = os.pidfd_open(pid)
+    except OSError as exc:
+        # ENOSYS before Linux 5.3, EPERM under older seccomp profiles.  The
+        # loop below cannot run without it; don't leave vng running untracked.
+        os.kill(pid, signal.SIGKILL)
+        os.close(fd)
+        os.waitpid(pid, 0)
+        return 1, f"[cannot track boot process: pidfd_open failed: {exc}]\n"
     with _child_procs_lock:
-        _child_pids.append(pid)
-
-    # Watchdog timer: kill child if it exceeds BOOT_TIMEOUT.
-    timed_out = threading.Event()
-
-    def _kill_on_timeout() -> None:
-        timed_out.set()
-        try:
-            os.kill(pid, signal.SIGKILL)
-        except ProcessLookupError:
-            pass
-
-    timer = threading.Timer(BOOT_TIMEOUT, _kill_on_timeout)
-    timer.start()
-
-    output_chunks: list[bytes] = []
+        _child_pidfds.append(pidfd)
+
+    deadline = time.monotonic() + BOOT_TIMEOUT
+    timed_out = False
+    output = bytearray()
+    os.set_blocking(fd, False)
+    poller = select.poll()
+    poller.register(fd, select.POLLIN)
+    poller.register(pidfd, select.POLLIN)
     try:
         while True:
-            try:
-                data = os.read(fd, 4096)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                try:
+                    signal.pidfd_send_signal(pidfd, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                break
+            ready = dict(poller.poll(remaining * 1000))
+            if fd in ready:
+                try:
+                    data = os.read(fd, 65536)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    break  # EIO: every holder of the PTY has gone
                 if not data:
                     break
-                output_chunks.append(data)
-            except OSError:
-                break
+                output.extend(data)
+            elif pidfd in ready:
+                break  # child exited and its output is drained
     finally:
-        timer.cancel()
         os.close(fd)
 
     _, status = os.waitpid(pid, 0)
@@ -391,56 +805,69 @@ def _run_vng_boot(kernel_dir: Path) -> tuple[int, str]:
 
     with _child_procs_lock:
         try:
-            _child_pids.remove(pid)
+            _child_pidfds.remove(pidfd)
         except ValueError:
             pass
+    os.close(pidfd)
 
-    if timed_out.is_set():
-        return 1, b"".join(output_chunks).decode(errors="replace") + "\n[boot timed out]\n"
+    if timed_out:
+        return 1, output.decode(errors="replace") + "\n[boot timed out]\n"
 
-    return rc, b"".join(output_chunks).decode(errors="replace")
+    return rc, output.decode(errors="replace")
+
+
+# A whole `uname -a` line, allowing surrounding whitespace (PTY output ends
+# lines with \r\n).  [^\S\n] is whitespace that cannot cross a line break.
+_UNAME_RE = re.compile(
+    r"^[^\S\n]*(Linux[^\S\n]+\S+[^\S\n]+\S+[^\S\n]+#\d+[^\S\n]+.*[^\S\n]+GNU/Linux)[^\S\n]*$",
+    re.MULTILINE,
+)
 
 
-def boot_test(log_path: Path, kernel_dir: Path) -> tuple[int, str]:
-    """Build defconfig and boot via vng, returning (exit_code, uname_output).
+def boot_test(
+    log_path: Path,
+    kernel_dir: Path,
+    build_dir: Path,
+    env: dict[str, str] | None = None,
+) -> tuple[int, str]:
+    """Build defconfig into *build_dir* and boot via vng, returning (exit_code, uname_output).
 
-    Always cleans first to ensure a known-good starting state.
+    Always starts from an empty *build_dir* to ensure a known-good starting state.
+    *env* (default: inherited) is passed to the build commands.
     """
     log_path.parent.mkdir(parents=True, exist_ok=True)
+    _fresh_build_dir(build_dir)
     header = [
         "boot-check mode",
         f"log={log_path}",
         f"kernel_dir={kernel_dir}",
+        f"build_dir={build_dir}",
     ]
     # Let vng handle its own config via virtme-configkernel, which adds
     # the 9p/virtio options required for virtme's root filesystem.
     # Manual "make defconfig" + "--skip-config" produces an unbootable kernel.
     build_commands = [
-        ["vng", "--clean"],
-        ["vng", "--build", "KCFLAGS=-Wno-error"],
+        ["vng", "--build", f"O={build_dir}", "KCFLAGS=-Wno-error"],
     ]
-    with log_path.open("w", encoding="utf-8") as log_fh:
+    with log_path.open("wb") as log_fh:
         for line in header:
-            log_fh.write(f"# {line}\n")
+            log_fh.write(f"# {line}\n".encode())
         for cmd in build_commands:
-            log_fh.write(f"# cmd: {' '.join(cmd)}\n")
-            rc = run_and_log(cmd, log_fh, cwd=kernel_dir)
+            log_fh.write(f"# cmd: {' '.join(cmd)}\n".encode())
+            rc = run_and_log(cmd, log_fh, cwd=kernel_dir, env=env)
             if rc != 0:
                 return rc, ""
 
     # Boot and capture uname output.
-    boot_rc, boot_output = _run_vng_boot(kernel_dir)
-    # Strip ANSI escape sequences and extract clean uname output
-    clean = ANSI_RE.sub("", boot_output).strip()
-    # Find the uname -a line: "Linux <host> <ver> ... GNU/Linux"
+    boot_rc, boot_output = _run_vng_boot(build_dir)
+    # Strip ANSI escape sequences and extract clean uname output: the last
+    # "Linux <host> <ver> ... GNU/Linux" line, found in a single regex pass.
+    clean = _strip_ansi(boot_output)
     uname_output = ""
-    for line in reversed(clean.splitlines()):
-        line = line.strip()
-        if re.match(r"Linux\s+\S+\s+\S+\s+#\d+\s+.*\s+GNU/Linux$", line):
-            uname_output = line
-            break
+    for m in _UNAME_RE.finditer(clean):
+        uname_output = m.group(1)
     with log_path.open("a", encoding="utf-8") as log_fh:
-        log_fh.write(f"# cmd: vng -r {kernel_dir} -e 'uname -a'\n")
+        log_fh.write(f"# cmd: vng -r {build_dir} -e 'uname -a'\n")
         log_fh.write(boot_output)
     # If vng exited 0 but we couldn't find a valid uname line, that's a failure.
     if boot_rc == 0 and not uname_output:
@@ -507,8 +934,21 @@ def _show_log_tail(log_path: Path, n: int = 5) -> None:
     if not log_path.exists():
         return
     click.echo(f"   log: {log_path}", err=True)
-    with log_path.open(errors="replace") as fh:
-        tail = deque((l.rstrip() for l in fh if l.strip()), maxlen=n)
+    # Build logs can be gigabytes: read backwards from the end in growing
+    # blocks until they hold *n* non-empty lines.
+    read_back = 64 << 10
+    with log_path.open("rb") as fh:
+        size = fh.seek(0, os.SEEK_END)
+        while True:
+            start = max(size - read_back, 0)
+            fh.seek(start)
+            lines = fh.read(size - start).decode(errors="replace").splitlines()
+            if start > 0:
+                lines = lines[1:]  # probably starts mid-line
+            tail = [l.rstrip() for l in lines if l.strip()][-n:]
+            if len(tail) == n or start == 0:
+                break
+            read_back *= 2
     for l in tail:
         click.echo(f"   {l}", err=True)
 
@@ -534,21 +974,19 @@ def main(baseline: str, kernel_dir: Path) -> None:
     """
     kernel_dir = kernel_dir.resolve()
     check_vng()
-    check_git_repo(kernel_dir)
-    check_clean_tree(kernel_dir)
+    check_clean_repo(kernel_dir)
 
     # Validate revisions before expensive operations
     try:
-        parent_short = resolve_rev_short(kernel_dir, baseline)
+        parent_short, head_rev = resolve_revs_short(kernel_dir, baseline, "HEAD")
     except subprocess.CalledProcessError as exc:
-        click.secho(f"❌ unknown revision: {baseline}", fg="red", err=True)
-        if exc.stderr:
-            click.echo(exc.stderr.strip(), err=True)
-        sys.exit(2)
-    try:
-        head_rev = resolve_rev_short(kernel_dir, "HEAD")
-    except subprocess.CalledProcessError as exc:
-        click.secho("❌ failed to resolve HEAD", fg="red", err=True)
+        # Only the failure path pays for a second lookup to name the culprit.
+        try:
+            resolve_rev_short(kernel_dir, "HEAD")
+        except subprocess.CalledProcessError:
+            click.secho("❌ failed to resolve HEAD", fg="red", err=True)
+        else:
+            click.secho(f"❌ unknown revision: {baseline}", fg="red", err=True)
         if exc.stderr:
             click.echo(exc.stderr.strip(), err=True)
         sys.exit(2)
@@ -568,23 +1006,25 @@ def main(baseline: str, kernel_dir: Path) -> None:
 
         tmp = Path(tempfile.mkdtemp(prefix="patchlint-logs-"))
 
-        # 5 worktrees: 2 baseline, 2 candidate @ HEAD, 1 boot @ HEAD.
-        # Each gets its own directory so all 5 builds run simultaneously
-        # without touching the main working tree.
+        # 2 worktrees: baseline and candidate @ HEAD.  All 5 builds run
+        # simultaneously out of tree (make O=), each into its own build
+        # directory, without touching the main working tree.
         with ExitStack() as stack:
+            # Fixed paths under a locked per-repository directory, so ccache
+            # can serve this run from the previous one.
+            work_dir = stack.enter_context(_locked_work_dir(kernel_dir))
             click.secho("🌲 Creating worktrees...", fg="yellow", err=True)
-            wt_baseline: dict[str, Path] = {}
-            wt_candidate: dict[str, Path] = {}
-            for cfg in WARN_CONFIGS:
-                wt_baseline[cfg] = stack.enter_context(
-                    git_worktree(kernel_dir, baseline)
-                )
-                wt_candidate[cfg] = stack.enter_context(
-                    git_worktree(kernel_dir, "HEAD")
-                )
-            wt_boot = stack.enter_context(
-                git_worktree(kernel_dir, "HEAD")
+            wt_baseline = stack.enter_context(
+                git_worktree(kernel_dir, baseline, work_dir / "baseline")
             )
+            wt_candidate = stack.enter_context(
+                git_worktree(kernel_dir, "HEAD", work_dir / "candidate")
+            )
+            # Build output is huge: keep it next to the worktrees rather
+            # than on tmpfs.
+            build_root = work_dir / "build"
+            stack.callback(shutil.rmtree, build_root, ignore_errors=True)
+            build_env = _ccache_env(work_dir / "ccache-bin", work_dir)
             click.secho("✅ Worktrees ready", fg="green", err=True)
 
             # Launch all 5 builds in parallel
@@ -598,17 +1038,22 @@ def main(baseline: str, kernel_dir: Path) -> None:
                     b_log = tmp / "baseline" / f"{cfg}.log"
                     baseline_logs[cfg] = b_log
                     futures[f"baseline-{cfg}"] = pool.submit(
-                        build_config, b_log, wt_baseline[cfg], cfg,
+                        build_config, b_log, wt_baseline, cfg,
+                        build_root / "baseline" / cfg, build_env,
                     )
 
                     c_log = tmp / "candidate" / f"{cfg}.log"
                     candidate_logs[cfg] = c_log
                     futures[f"candidate-{cfg}"] = pool.submit(
-                        build_config, c_log, wt_candidate[cfg], cfg,
+                        build_config, c_log, wt_candidate, cfg,
+                        build_root / "candidate" / cfg, build_env,
                     )
 
                 boot_log = tmp / "candidate" / "defconfig-boot.log"
-                futures["boot"] = pool.submit(boot_test, boot_log, wt_boot)
+                futures["boot"] = pool.submit(
+                    boot_test, boot_log, wt_candidate, build_root / "boot",
+                    build_env,
+                )
 
             # Collect results
             build_failed = False
@@ -0,0 +1,33 @@
+"""Shared fixtures."""
+import pytest
+from click.testing import CliRunner
+
+import patchlint
+
+
+@pytest.fixture(scope="session")
+def runner():
+    # CliRunner keeps no state between invoke() calls, so one is enough.
+    return CliRunner()
+
+
+@pytest.fixture
+def fake_resolve(monkeypatch):
+    """Resolve every revision to the same short hash without running git."""
+    monkeypatch.setattr(patchlint, "resolve_rev_short", lambda *a: "abc123def456")
+    monkeypatch.setattr(
+        patchlint, "resolve_revs_short", lambda *a: ["abc123def456"] * (len(a) - 1),
+    )
+
+
+@pytest.fixture
+def patched_env(monkeypatch, fake_resolve):
+    """Pass main()'s preflight: vng present, clean repo, revisions resolve.
+
+    Plain setattr via monkeypatch; tests patch only what they exercise.
+    """
+    monkeypatch.setattr(
+        patchlint.shutil, "which", lambda cmd: "/usr/bin/vng" if cmd == "vng" else None,
+    )
+    monkeypatch.setattr(patchlint, "check_clean_repo", lambda *a: None)
+    monkeypatch.setattr(patchlint, "run_capture", lambda *a, **k: "1\n")
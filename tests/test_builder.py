@@ -1,25 +1,78 @@
 """Tests for build sequences with mocked subprocess."""
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import patch
+import errno
+import fcntl
 import io
-
-from patchlint import build_config, boot_test, run_and_log
+import os
+import time
+
+import pytest
+
+import patchlint
+from patchlint import (
+    PIPE_SIZE,
+    _ccache_env,
+    _reap,
+    _run_vng_boot,
+    _spawn,
+    build_config,
+    boot_test,
+    run_and_log,
+)
+
+
+def _pipe_size_allowed():
+    """Whether this host lets an unprivileged pipe grow to PIPE_SIZE."""
+    r, w = os.pipe()
+    try:
+        fcntl.fcntl(w, fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+    except OSError:
+        # Above /proc/sys/fs/pipe-max-size or the user's pipe page quota.
+        return False
+    finally:
+        os.close(r)
+        os.close(w)
+    return True
 
 
 class TestRunAndLog:
     def test_writes_to_log_only(self, tmp_path):
-        log_fh = io.StringIO()
-        with patch("patchlint.subprocess.Popen") as mock_popen:
-            mock_proc = MagicMock()
-            mock_stdout = io.StringIO("output\n")
-            mock_proc.stdout = mock_stdout
-            mock_proc.wait.return_value = 0
-            mock_popen.return_value = mock_proc
-
+        log_fh = io.BytesIO()
+        proc = SimpleNamespace(stdout=io.BytesIO(b"output\n"), wait=lambda: 0)
+        with patch("patchlint.subprocess.Popen", return_value=proc):
             rc = run_and_log(["echo", "hi"], log_fh)
 
         assert rc == 0
-        assert "output\n" in log_fh.getvalue()
+        assert b"output\n" in log_fh.getvalue()
+
+    def test_real_process_output(self, tmp_path):
+        log_path = tmp_path / "run.log"
+        with log_path.open("wb") as log_fh:
+            rc = run_and_log(["sh", "-c", "echo out; echo err >&2; exit 3"], log_fh)
+
+        assert rc == 3
+        assert log_path.read_bytes().splitlines() == [b"out", b"err"]
+
+    def test_spawn_grows_pipe(self):
+        if not _pipe_size_allowed():
+            pytest.skip("pipes cannot grow to PIPE_SIZE on this host")
+        proc = _spawn(["true"])
+        try:
+            size = fcntl.fcntl(proc.stdout.fileno(), fcntl.F_GETPIPE_SZ)
+        finally:
+            _reap(proc)
+        assert size == PIPE_SIZE
+
+    def test_keeps_buffered_header_before_output(self, tmp_path):
+        log_path = tmp_path / "run.log"
+        with log_path.open("wb") as log_fh:
+            log_fh.write(b"# header\n")
+            run_and_log(["echo", "body"], log_fh)
+            log_fh.write(b"# trailer\n")
+
+        assert log_path.read_bytes() == b"# header\nbody\n# trailer\n"
 
 
 class TestBuildConfig:
@@ -27,31 +80,50 @@ class TestBuildConfig:
         log_path = tmp_path / "build.log"
 
         with patch("patchlint.run_and_log", return_value=0) as mock_log:
-            rc = build_config(log_path, Path("/src/linux"), "allmodconfig")
+            rc = build_config(log_path, Path("/src/linux"), "allmodconfig", tmp_path / "out")
 
         assert rc == 0
-        assert mock_log.call_count == 5
+        assert mock_log.call_count == 4
+        out = f"O={tmp_path / 'out'}"
         cmds = [c.args[0] for c in mock_log.call_args_list]
-        assert cmds[0] == ["vng", "--clean"]
-        assert cmds[1] == ["make", "allmodconfig"]
-        assert cmds[2] == ["./scripts/config", "-d", "WERROR"]
-        assert cmds[3] == ["make", "olddefconfig"]
-        assert cmds[4] == ["vng", "--build", "--skip-config", "KCFLAGS=-Wno-error"]
+        assert cmds[0] == ["make", out, "allmodconfig"]
+        assert cmds[1] == [
+            "./scripts/config", "--file", str(tmp_path / "out" / ".config"),
+            "-d", "WERROR",
+        ]
+        assert cmds[2] == ["make", out, "olddefconfig"]
+        assert cmds[3] == ["vng", "--build", "--skip-config", out, "KCFLAGS=-Wno-error"]
+        assert all(c.kwargs["cwd"] == Path("/src/linux") for c in mock_log.call_args_list)
+
+    def test_env_passed_through(self, tmp_path):
+        log_path = tmp_path / "build.log"
+
+        with patch("patchlint.run_and_log", return_value=0) as mock_log:
+            build_config(
+                log_path, Path("/src/linux"), "allmodconfig", tmp_path / "out",
+                {"PATH": "/ccache-bin:/usr/bin"},
+            )
+
+        for c in mock_log.call_args_list:
+            assert c.kwargs["env"] == {"PATH": "/ccache-bin:/usr/bin"}
 
     def test_always_cleans(self, tmp_path):
         log_path = tmp_path / "build.log"
+        stale = tmp_path / "out" / "vmlinux.o"
+        stale.parent.mkdir()
+        stale.touch()
 
-        with patch("patchlint.run_and_log", return_value=0) as mock_log:
-            build_config(log_path, Path("/src/linux"), "allmodconfig")
+        with patch("patchlint.run_and_log", return_value=0):
+            build_config(log_path, Path("/src/linux"), "allmodconfig", tmp_path / "out")
 
-        first_cmd = mock_log.call_args_list[0].args[0]
-        assert first_cmd == ["vng", "--clean"]
+        assert (tmp_path / "out").is_dir()
+        assert not stale.exists()
 
     def test_stops_on_first_failure(self, tmp_path):
         log_path = tmp_path / "build.log"
 
         with patch("patchlint.run_and_log", side_effect=[0, 1]) as mock_log:
-            rc = build_config(log_path, Path("/src/linux"), "allmodconfig")
+            rc = build_config(log_path, Path("/src/linux"), "allmodconfig", tmp_path / "out")
 
         assert rc == 1
         assert mock_log.call_count == 2
@@ -60,7 +132,7 @@ class TestBuildConfig:
         log_path = tmp_path / "subdir" / "build.log"
 
         with patch("patchlint.run_and_log", return_value=0):
-            build_config(log_path, Path("/src/linux"), "defconfig")
+            build_config(log_path, Path("/src/linux"), "defconfig", tmp_path / "out")
 
         assert log_path.exists()
         content = log_path.read_text()
@@ -71,7 +143,7 @@ class TestBuildConfig:
         log_path = tmp_path / "build.log"
 
         with patch("patchlint.run_and_log", return_value=0) as mock_log:
-            build_config(log_path, Path("/src/linux"), "allmodconfig")
+            build_config(log_path, Path("/src/linux"), "allmodconfig", tmp_path / "out")
 
         last_cmd = mock_log.call_args_list[-1].args[0]
         assert "KCFLAGS=-Wno-error" in last_cmd
@@ -84,7 +156,7 @@ class TestBootTest:
         with patch("patchlint.run_and_log", return_value=0), \
              patch("patchlint._run_vng_boot",
                    return_value=(0, "Linux (none) 6.12.0-rc1 #1 SMP x86_64 GNU/Linux\n")):
-            rc, uname = boot_test(log_path, Path("/src/linux"))
+            rc, uname = boot_test(log_path, Path("/src/linux"), tmp_path / "out")
 
         assert rc == 0
         assert "6.12.0-rc1" in uname
@@ -95,28 +167,29 @@ class TestBootTest:
 
         with patch("patchlint.run_and_log", return_value=0) as mock_log, \
              patch("patchlint._run_vng_boot", return_value=(0, uname)):
-            boot_test(log_path, Path("/src/linux"))
+            boot_test(log_path, Path("/src/linux"), tmp_path / "out")
 
-        assert mock_log.call_count == 2
+        assert mock_log.call_count == 1
         cmds = [c.args[0] for c in mock_log.call_args_list]
-        assert cmds[0] == ["vng", "--clean"]
-        assert cmds[1] == ["vng", "--build", "KCFLAGS=-Wno-error"]
+        assert cmds[0] == ["vng", "--build", f"O={tmp_path / 'out'}", "KCFLAGS=-Wno-error"]
 
     def test_build_failure_skips_boot(self, tmp_path):
         log_path = tmp_path / "boot.log"
 
-        with patch("patchlint.run_and_log", side_effect=[0, 1]):
-            rc, uname = boot_test(log_path, Path("/src/linux"))
+        with patch("patchlint.run_and_log", return_value=1), \
+             patch("patchlint._run_vng_boot") as mock_boot:
+            rc, uname = boot_test(log_path, Path("/src/linux"), tmp_path / "out")
 
         assert rc == 1
         assert uname == ""
+        mock_boot.assert_not_called()
 
     def test_boot_failure(self, tmp_path):
         log_path = tmp_path / "boot.log"
 
         with patch("patchlint.run_and_log", return_value=0), \
              patch("patchlint._run_vng_boot", return_value=(1, "")):
-            rc, uname = boot_test(log_path, Path("/src/linux"))
+            rc, uname = boot_test(log_path, Path("/src/linux"), tmp_path / "out")
 
         assert rc == 1
 
@@ -126,12 +199,39 @@ class TestBootTest:
         with patch("patchlint.run_and_log", return_value=0), \
              patch("patchlint._run_vng_boot",
                    return_value=(0, "Linux (none) 6.12.0-rc1 #1 SMP x86_64 GNU/Linux\n")):
-            boot_test(log_path, Path("/src/linux"))
+            boot_test(log_path, Path("/src/linux"), tmp_path / "out")
 
         content = log_path.read_text()
         assert "vng -r" in content
         assert "6.12.0-rc1" in content
 
+    def test_picks_last_uname_line_from_pty_output(self, tmp_path):
+        log_path = tmp_path / "boot.log"
+        output = (
+            "\x1b[0m[    0.000000] Linux version 6.18.0 (gcc)\r\n"
+            "  Linux host 6.17.0 #1 SMP x86_64 GNU/Linux\r\n"
+            "  Linux virtme-ng 6.18.0-virtme #1 SMP x86_64 GNU/Linux  \r\n"
+            "[    1.000000] reboot: Power down\r\n"
+        )
+
+        with patch("patchlint.run_and_log", return_value=0), \
+             patch("patchlint._run_vng_boot", return_value=(0, output)):
+            rc, uname = boot_test(log_path, Path("/src/linux"), tmp_path / "out")
+
+        assert rc == 0
+        assert uname == "Linux virtme-ng 6.18.0-virtme #1 SMP x86_64 GNU/Linux"
+
+    def test_uname_must_fit_on_one_line(self, tmp_path):
+        log_path = tmp_path / "boot.log"
+        output = "Linux virtme-ng 6.18.0\n#1 SMP x86_64 GNU/Linux\n"
+
+        with patch("patchlint.run_and_log", return_value=0), \
+             patch("patchlint._run_vng_boot", return_value=(0, output)):
+            rc, uname = boot_test(log_path, Path("/src/linux"), tmp_path / "out")
+
+        assert rc == 1
+        assert uname == ""
+
     def test_invalid_uname_fails(self, tmp_path):
         """vng exits 0 but output doesn't contain valid uname — should fail."""
         log_path = tmp_path / "boot.log"
@@ -139,7 +239,84 @@ class TestBootTest:
         with patch("patchlint.run_and_log", return_value=0), \
              patch("patchlint._run_vng_boot",
                    return_value=(0, "some garbage output\n")):
-            rc, uname = boot_test(log_path, Path("/src/linux"))
+            rc, uname = boot_test(log_path, Path("/src/linux"), tmp_path / "out")
 
         assert rc == 1
         assert uname == ""
+
+
+class TestRunVngBoot:
+    """Drive the real forkpty/read loop with a stand-in ``vng`` script."""
+
+    @staticmethod
+    def _fake_vng(tmp_path, monkeypatch, body):
+        bindir = tmp_path / "bin"
+        bindir.mkdir()
+        vng = bindir / "vng"
+        vng.write_text(f"#!/bin/sh\n{body}\n")
+        vng.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+
+    def test_captures_output_and_rc(self, tmp_path, monkeypatch):
+        self._fake_vng(tmp_path, monkeypatch, "echo booted; exit 3")
+        rc, out = _run_vng_boot(tmp_path)
+        assert rc == 3
+        assert "booted" in out
+        assert patchlint._child_pidfds == []
+
+    def test_timeout_kills_child(self, tmp_path, monkeypatch):
+        self._fake_vng(tmp_path, monkeypatch, "echo starting; exec sleep 30")
+        monkeypatch.setattr(patchlint, "BOOT_TIMEOUT", 0.5)
+        rc, out = _run_vng_boot(tmp_path)
+        assert rc == 1
+        assert "starting" in out
+        assert "[boot timed out]" in out
+
+    def test_returns_when_child_exits_despite_lingering_pty_holder(self, tmp_path, monkeypatch):
+        # A backgrounded grandchild keeps the PTY open; the pidfd still
+        # reports vng's own exit.
+        self._fake_vng(tmp_path, monkeypatch, "sleep 3 & echo done; exit 0")
+        monkeypatch.setattr(patchlint, "BOOT_TIMEOUT", 10)
+        rc, out = _run_vng_boot(tmp_path)
+        assert rc == 0
+        assert "done" in out
+        assert "[boot timed out]" not in out
+
+    def test_pidfd_open_failure_kills_child(self, tmp_path, monkeypatch):
+        self._fake_vng(tmp_path, monkeypatch, "exec sleep 30")
+
+        def no_pidfd(pid):
+            raise OSError(errno.ENOSYS, "Function not implemented")
+
+        monkeypatch.setattr(patchlint.os, "pidfd_open", no_pidfd)
+        start = time.monotonic()
+        rc, out = _run_vng_boot(tmp_path)
+        assert time.monotonic() - start < 10
+        assert rc == 1
+        assert "pidfd_open failed" in out
+        assert patchlint._child_pidfds == []
+
+
+class TestCcacheEnv:
+    def test_no_ccache(self, tmp_path):
+        with patch("patchlint.shutil.which", return_value=None):
+            assert _ccache_env(tmp_path / "bin", tmp_path) is None
+        assert not (tmp_path / "bin").exists()
+
+    def test_masquerades_compilers(self, tmp_path):
+        with patch("patchlint.shutil.which", return_value="/usr/bin/ccache"):
+            env = _ccache_env(tmp_path / "bin", tmp_path)
+
+        assert env["PATH"].startswith(f"{tmp_path / 'bin'}{os.pathsep}")
+        assert env["CCACHE_BASEDIR"] == str(tmp_path)
+        assert env["KBUILD_BUILD_TIMESTAMP"] == "@0"
+        for cc in ("gcc", "cc"):
+            assert os.readlink(tmp_path / "bin" / cc) == "/usr/bin/ccache"
+
+    def test_reuses_bin_dir(self, tmp_path):
+        """The work directory persists between runs, and so do the symlinks."""
+        with patch("patchlint.shutil.which", return_value="/usr/bin/ccache"):
+            _ccache_env(tmp_path / "bin", tmp_path)
+        with patch("patchlint.shutil.which", return_value="/usr/local/bin/ccache"):
+            _ccache_env(tmp_path / "bin", tmp_path)
+        assert os.readlink(tmp_path / "bin" / "gcc") == "/usr/local/bin/ccache"
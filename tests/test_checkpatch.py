@@ -1,117 +1,107 @@
 """Tests for checkpatch integration."""
-from pathlib import Path
-from unittest.mock import patch, MagicMock
+from contextlib import contextmanager
+from unittest.mock import patch
 
 import pytest
-from click.testing import CliRunner
 
+import patchlint
 from patchlint import run_checkpatch, main
 
 
-class TestRunCheckpatch:
-    def test_passes(self, tmp_path):
-        """checkpatch returns 0 → no exception."""
-        (tmp_path / "scripts").mkdir()
-        (tmp_path / "scripts" / "checkpatch.pl").touch()
-
-        git_proc = MagicMock()
-        git_proc.stdout = MagicMock()
-        git_proc.wait.return_value = 0
+_CLEAN_CP_STDOUT = b"total: 0 errors, 0 warnings\n"
 
-        cp_proc = MagicMock()
-        cp_proc.stdout.read.return_value = "total: 0 errors, 0 warnings\n"
-        cp_proc.returncode = 0
-        cp_proc.wait.return_value = 0
 
-        with patch("patchlint.subprocess.Popen", side_effect=[git_proc, cp_proc]):
-            run_checkpatch(tmp_path, "HEAD~1")  # should not raise
+def _noop(*args, **kwargs):
+    return None
 
-    def test_fails(self, tmp_path):
-        """checkpatch returns 1 → SystemExit(2) with output shown."""
-        (tmp_path / "scripts").mkdir()
-        (tmp_path / "scripts" / "checkpatch.pl").touch()
 
-        git_proc = MagicMock()
-        git_proc.stdout = MagicMock()
-        git_proc.wait.return_value = 0
+@pytest.fixture(scope="module")
+def kernel_tree(tmp_path_factory):
+    """A kernel directory holding only an empty scripts/checkpatch.pl."""
+    tree = tmp_path_factory.mktemp("kernel")
+    (tree / "scripts").mkdir()
+    (tree / "scripts" / "checkpatch.pl").touch()
+    return tree
 
-        cp_output = "ERROR: trailing whitespace\ntotal: 1 errors, 0 warnings\n"
-        cp_proc = MagicMock()
-        cp_proc.stdout.read.return_value = cp_output
-        cp_proc.returncode = 1
-        cp_proc.wait.return_value = 1
 
-        with patch("patchlint.subprocess.Popen", side_effect=[git_proc, cp_proc]):
-            with pytest.raises(SystemExit) as exc_info:
-                run_checkpatch(tmp_path, "HEAD~1")
-            assert exc_info.value.code == 2
+class TestRunCheckpatch:
+    def test_passes(self, kernel_tree, fake_process):
+        """checkpatch returns 0 → no exception."""
+        fake_process.register(["git", "format-patch", "--stdout", "HEAD~1..HEAD"])
+        fake_process.register(
+            [str(kernel_tree / "scripts" / "checkpatch.pl"), "-"],
+            stdout=_CLEAN_CP_STDOUT,
+        )
+        run_checkpatch(kernel_tree, "HEAD~1")  # should not raise
+
+    def test_fails(self, kernel_tree, fake_process, capsys):
+        """checkpatch returns 1 → SystemExit(2) with output shown."""
+        cp_output = b"ERROR: trailing whitespace\ntotal: 1 errors, 0 warnings\n"
+        fake_process.register(["git", fake_process.any()])
+        fake_process.register([fake_process.any()], stdout=cp_output, returncode=1)
+        with pytest.raises(SystemExit, match="^2$"):
+            run_checkpatch(kernel_tree, "HEAD~1")
+        assert cp_output.decode() in capsys.readouterr().err
+
+    def test_failure_output_is_shown(self, tmp_path, capsys):
+        """Real processes: checkpatch's report is replayed to stderr on failure."""
+        (tmp_path / "scripts").mkdir()
+        script = tmp_path / "scripts" / "checkpatch.pl"
+        script.write_text(
+            "#!/bin/sh\ncat >/dev/null\n"
+            "echo 'ERROR: trailing whitespace'\necho 'total: 1 errors'\nexit 1\n"
+        )
+        script.chmod(0o755)
+
+        with pytest.raises(SystemExit, match="^2$"):
+            run_checkpatch(tmp_path, "HEAD~1")
+        err = capsys.readouterr().err
+        assert "ERROR: trailing whitespace\ntotal: 1 errors\n" in err
 
     def test_script_missing(self, tmp_path):
         """scripts/checkpatch.pl not found → SystemExit(2)."""
         # No scripts/checkpatch.pl in tmp_path
-        with pytest.raises(SystemExit) as exc_info:
+        with pytest.raises(SystemExit, match="^2$"):
             run_checkpatch(tmp_path, "HEAD~1")
-        assert exc_info.value.code == 2
 
 
 class TestCheckpatchCLIIntegration:
     """Test checkpatch integration within the check command via CliRunner."""
 
-    @pytest.fixture
-    def runner(self):
-        return CliRunner()
-
-    def test_checkpatch_fails_before_builds(self, runner, tmp_path):
+    def test_checkpatch_fails_before_builds(self, runner, kernel_tree, fake_process, patched_env):
         """When checkpatch fails, exit_code=2 and builds never start."""
-        (tmp_path / "scripts").mkdir()
-        (tmp_path / "scripts" / "checkpatch.pl").touch()
-
-        git_proc = MagicMock()
-        git_proc.stdout = MagicMock()
-        git_proc.wait.return_value = 0
-
-        cp_proc = MagicMock()
-        cp_proc.stdout.read.return_value = "ERROR: bad style\n"
-        cp_proc.returncode = 1
-        cp_proc.wait.return_value = 1
-
-        with patch("patchlint.shutil.which", return_value="/usr/bin/vng"), \
-             patch("patchlint.check_git_repo"), \
-             patch("patchlint.check_clean_tree"), \
-             patch("patchlint.resolve_rev_short", return_value="abc123def456"), \
-             patch("patchlint.run_capture", return_value="1\n"), \
-             patch("patchlint.subprocess.Popen", side_effect=[git_proc, cp_proc]), \
-             patch("patchlint.build_config") as mock_build, \
+        fake_process.register(["git", fake_process.any()])
+        fake_process.register([fake_process.any()], stdout=b"ERROR: bad style\n", returncode=1)
+
+        with patch("patchlint.build_config") as mock_build, \
              patch("patchlint.boot_test") as mock_boot:
-            result = runner.invoke(main, ["HEAD~1", str(tmp_path)])
+            result = runner.invoke(main, ["HEAD~1", str(kernel_tree)])
             assert result.exit_code == 2
+            assert "ERROR: bad style" in result.output
             mock_build.assert_not_called()
             mock_boot.assert_not_called()
 
-    def test_checkpatch_passes_continues(self, runner, tmp_path):
+    def test_checkpatch_passes_continues(
+        self, runner, kernel_tree, fake_process, patched_env, monkeypatch,
+    ):
         """When checkpatch passes, builds are attempted."""
-        (tmp_path / "scripts").mkdir()
-        (tmp_path / "scripts" / "checkpatch.pl").touch()
-
-        git_proc = MagicMock()
-        git_proc.stdout = MagicMock()
-        git_proc.wait.return_value = 0
-
-        cp_proc = MagicMock()
-        cp_proc.stdout.read.return_value = "total: 0 errors, 0 warnings\n"
-        cp_proc.returncode = 0
-        cp_proc.wait.return_value = 0
-
-        with patch("patchlint.shutil.which", return_value="/usr/bin/vng"), \
-             patch("patchlint.check_git_repo"), \
-             patch("patchlint.check_clean_tree"), \
-             patch("patchlint.subprocess.Popen", side_effect=[git_proc, cp_proc]), \
-             patch("patchlint.resolve_rev_short", return_value="abc123def456"), \
-             patch("patchlint.run_capture", return_value="1\n"), \
-             patch("patchlint.git_worktree") as mock_wt, \
-             patch("patchlint.build_config", return_value=0) as mock_build, \
-             patch("patchlint.boot_test", return_value=(0, "Linux test 6.x #1 SMP GNU/Linux")) as mock_boot:
-            mock_wt.return_value.__enter__ = MagicMock(return_value=tmp_path)
-            mock_wt.return_value.__exit__ = MagicMock(return_value=False)
-            result = runner.invoke(main, ["HEAD~1", str(tmp_path)])
-            assert mock_build.called or mock_boot.called
+        fake_process.register(["git", fake_process.any()])
+        fake_process.register([fake_process.any()], stdout=_CLEAN_CP_STDOUT)
+
+        built = []
+        monkeypatch.setattr(patchlint, "build_config", lambda *a: built.append(a[2]) or 0)
+        monkeypatch.setattr(
+            patchlint, "boot_test", lambda *a: (0, "Linux test 6.x #1 SMP GNU/Linux"),
+        )
+        monkeypatch.setattr(patchlint, "_ccache_env", _noop)
+        monkeypatch.setattr(patchlint, "compare_warnings", lambda *a: [])
+
+        @contextmanager
+        def _fake_wt(*args, **kwargs):
+            yield kernel_tree
+
+        monkeypatch.setattr(patchlint, "git_worktree", _fake_wt)
+        result = runner.invoke(main, ["HEAD~1", str(kernel_tree)])
+        assert result.exit_code == 0
+        assert sorted(built) == sorted(patchlint.WARN_CONFIGS * 2)
+        assert "Linux test 6.x" in result.output
@@ -1,17 +1,18 @@
 """Click CLI integration tests using CliRunner."""
-from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 import subprocess
 
+import click
 import pytest
-from click.testing import CliRunner
 
-from patchlint import main
+from patchlint import _show_log_tail, check_vng, main
 
-
-@pytest.fixture
-def runner():
-    return CliRunner()
+_BAD_REV_EXC = subprocess.CalledProcessError(
+    128, "git", stderr="fatal: bad revision 'typo123'\n"
+)
+_BAD_HEAD_EXC = subprocess.CalledProcessError(
+    128, "git", stderr="fatal: ambiguous argument 'HEAD'\n"
+)
 
 
 def test_help(runner):
@@ -25,23 +26,49 @@ def test_baseline_required(runner):
     assert result.exit_code != 0
 
 
-def test_no_vng(runner, tmp_path):
-    with patch("patchlint.shutil.which", return_value=None):
-        result = runner.invoke(main, ["HEAD~1", str(tmp_path)])
-    assert result.exit_code != 0
-    assert "vng" in result.output
+def test_no_vng():
+    with patch("patchlint.shutil.which", return_value=None), \
+         pytest.raises(click.UsageError, match="vng"):
+        check_vng()
 
 
-def test_bad_baseline_rev(runner, tmp_path):
+def test_bad_baseline_rev(runner, tmp_path, patched_env):
     """Bad baseline revision produces a friendly error, not a traceback."""
-    exc = subprocess.CalledProcessError(
-        128, "git", stderr="fatal: bad revision 'typo123'\n"
-    )
-    with patch("patchlint.shutil.which", return_value="/usr/bin/vng"), \
-         patch("patchlint.check_git_repo"), \
-         patch("patchlint.check_clean_tree"), \
-         patch("patchlint.resolve_rev_short", side_effect=exc):
+    with patch("patchlint.resolve_revs_short", side_effect=_BAD_REV_EXC):
         result = runner.invoke(main, ["typo123", str(tmp_path)])
     assert result.exit_code == 2
     assert "unknown revision" in result.output
     assert "typo123" in result.output
+
+
+def test_bad_head_rev(runner, tmp_path, patched_env):
+    """Failing to resolve HEAD is reported as such, not as a bad baseline."""
+    with patch("patchlint.resolve_revs_short", side_effect=_BAD_HEAD_EXC), \
+         patch("patchlint.resolve_rev_short", side_effect=_BAD_HEAD_EXC):
+        result = runner.invoke(main, ["HEAD~1", str(tmp_path)])
+    assert result.exit_code == 2
+    assert "failed to resolve HEAD" in result.output
+
+
+def test_show_log_tail(tmp_path, capsys):
+    log = tmp_path / "build.log"
+    log.write_text("".join(f"line {i}\n\n" for i in range(10)))
+    _show_log_tail(log, n=3)
+    err = capsys.readouterr().err.splitlines()
+    assert err == [f"   log: {log}", "   line 7", "   line 8", "   line 9"]
+
+
+def test_show_log_tail_reads_back_past_first_block(tmp_path, capsys):
+    """Short final lines after a huge one: the block must grow to find n lines."""
+    log = tmp_path / "build.log"
+    log.write_text("first\n" + "x" * (200 << 10) + "\nlast\n")
+    _show_log_tail(log, n=3)
+    err = capsys.readouterr().err.splitlines()
+    assert err[1] == "   first"
+    assert err[2] == "   " + "x" * (200 << 10)
+    assert err[3] == "   last"
+
+
+def test_show_log_tail_missing_log(tmp_path, capsys):
+    _show_log_tail(tmp_path / "nope.log")
+    assert capsys.readouterr().err == ""
@@ -1,114 +1,330 @@
 """Tests for git/worktree operations with mocked subprocess."""
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+import os
+import shutil
 import subprocess
 
 import click
 import pytest
 
+import patchlint
 from patchlint import (
-    check_git_repo,
-    check_clean_tree,
+    check_clean_repo,
     check_vng,
     resolve_rev_short,
+    resolve_revs_short,
     git_worktree,
+    _locked_work_dir,
 )
 
 
-class TestCheckGitRepo:
-    def test_valid_repo(self, tmp_path):
-        with patch("patchlint.subprocess.run") as mock_run:
-            mock_run.return_value = MagicMock(returncode=0)
-            check_git_repo(tmp_path)  # should not raise
+_HEADERS = b"# branch.oid abc\0# branch.head main\0"
+
+_NOT_A_REPO_EXC = subprocess.CalledProcessError(128, "git")
+_BAD_COMMIT_EXC = subprocess.CalledProcessError(
+    128, "git", stderr="fatal: 'badrev' is not a commit\n"
+)
+_BAD_OBJECT_EXC = subprocess.CalledProcessError(128, "git", stderr="fatal: bad object\n")
+
+
+def _git(cwd, *args):
+    """Run real git in *cwd* and return its stdout."""
+    return subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=cwd, check=True, capture_output=True, text=True,
+    ).stdout
+
+
+def _raise(exc):
+    def fake(*args, **kwargs):
+        raise exc
+    return fake
 
-    def test_not_a_repo(self, tmp_path):
-        with patch("patchlint.subprocess.run", side_effect=subprocess.CalledProcessError(128, "git")):
-            with pytest.raises(click.UsageError, match="not a git repository"):
-                check_git_repo(tmp_path)
 
+def _recording_run(calls, result):
+    """A subprocess.run stand-in that records each call and returns *result*."""
+    def fake(cmd, **kwargs):
+        calls.append((cmd, kwargs))
+        return result
+    return fake
 
-class TestCheckCleanTree:
-    def test_clean_tree(self, tmp_path):
-        with patch("patchlint.subprocess.run") as mock_run:
-            mock_run.return_value = MagicMock(returncode=0)
-            check_clean_tree(tmp_path)  # should not raise
 
-    def test_dirty_unstaged(self, tmp_path):
-        with patch("patchlint.subprocess.run") as mock_run:
-            mock_run.side_effect = subprocess.CalledProcessError(1, "git diff")
-            with pytest.raises(click.UsageError, match="dirty"):
-                check_clean_tree(tmp_path)
+class TestCheckCleanRepo:
+    def test_clean_repo(self, tmp_path, monkeypatch):
+        calls = []
+        monkeypatch.setattr(
+            patchlint.subprocess, "run",
+            _recording_run(calls, SimpleNamespace(returncode=0, stdout=_HEADERS)),
+        )
+        check_clean_repo(tmp_path)  # should not raise
+        assert len(calls) == 1
+
+    def test_not_a_repo(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(patchlint.subprocess, "run", _raise(_NOT_A_REPO_EXC))
+        with pytest.raises(click.UsageError, match="not a git repository"):
+            check_clean_repo(tmp_path)
+
+    def test_git_missing(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(patchlint.subprocess, "run", _raise(FileNotFoundError("git")))
+        with pytest.raises(click.UsageError, match="not a git repository"):
+            check_clean_repo(tmp_path)
 
-    def test_dirty_staged(self, tmp_path):
-        def side_effect(*args, **kwargs):
-            cmd = args[0]
-            if "--cached" in cmd:
-                raise subprocess.CalledProcessError(1, "git diff --cached")
-            return MagicMock(returncode=0)
+    def test_dirty_unstaged(self, tmp_path, monkeypatch):
+        entry = b"1 .M N... 100644 100644 100644 aaa aaa foo.c\0"
+        monkeypatch.setattr(
+            patchlint.subprocess, "run",
+            lambda *a, **k: SimpleNamespace(returncode=0, stdout=_HEADERS + entry),
+        )
+        with pytest.raises(click.UsageError, match="dirty"):
+            check_clean_repo(tmp_path)
 
-        with patch("patchlint.subprocess.run", side_effect=side_effect):
-            with pytest.raises(click.UsageError, match="dirty"):
-                check_clean_tree(tmp_path)
+    def test_dirty_staged(self, tmp_path, monkeypatch):
+        entry = b"1 M. N... 100644 100644 100644 aaa bbb foo.c\0"
+        monkeypatch.setattr(
+            patchlint.subprocess, "run",
+            lambda *a, **k: SimpleNamespace(returncode=0, stdout=entry),
+        )
+        with pytest.raises(click.UsageError, match="dirty"):
+            check_clean_repo(tmp_path)
 
 
 class TestCheckVng:
-    def test_vng_found(self):
-        with patch("patchlint.shutil.which", return_value="/usr/bin/vng"):
-            check_vng()  # should not raise
+    def test_vng_found(self, monkeypatch):
+        monkeypatch.setattr(patchlint.shutil, "which", lambda cmd: "/usr/bin/vng")
+        check_vng()  # should not raise
 
-    def test_vng_not_found(self):
-        with patch("patchlint.shutil.which", return_value=None):
-            with pytest.raises(click.UsageError, match="vng"):
-                check_vng()
+    def test_vng_not_found(self, monkeypatch):
+        monkeypatch.setattr(patchlint.shutil, "which", lambda cmd: None)
+        with pytest.raises(click.UsageError, match="vng"):
+            check_vng()
 
 
 class TestResolveRevShort:
-    def test_resolves_rev(self, tmp_path):
-        with patch("patchlint.run_capture", return_value="abc123def456\n"):
-            result = resolve_rev_short(tmp_path, "HEAD~1")
-        assert result == "abc123def456"
+    def test_resolves_rev(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            patchlint.subprocess, "run",
+            lambda *a, **k: SimpleNamespace(stdout="abc123def456" + "0" * 28 + "\n"),
+        )
+        assert resolve_rev_short(tmp_path, "HEAD~1") == "abc123def456"
+
+    def test_resolves_several_revs_in_one_call(self, tmp_path, monkeypatch):
+        calls = []
+        out = "abc123def456" + "0" * 28 + "\n0123456789ab" + "1" * 28 + "\n"
+        monkeypatch.setattr(
+            patchlint.subprocess, "run", _recording_run(calls, SimpleNamespace(stdout=out)),
+        )
+        result = resolve_revs_short(tmp_path, "HEAD~1", "HEAD")
+        assert result == ["abc123def456", "0123456789ab"]
+        assert len(calls) == 1
+        assert calls[0][1]["input"] == "HEAD~1\nHEAD\n"
+
+    def test_bad_rev(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            patchlint.subprocess, "run",
+            lambda *a, **k: SimpleNamespace(stdout="typo123 missing\n" + "1" * 40 + "\n"),
+        )
+        with pytest.raises(subprocess.CalledProcessError) as exc_info:
+            resolve_revs_short(tmp_path, "typo123", "HEAD")
+        assert "typo123" in exc_info.value.stderr
+
+    def test_real_repo(self, tmp_path):
+        """The faked cat-file output above must match what git really prints."""
+        _git(tmp_path, "init", "-q")
+        for msg in ("one", "two"):
+            _git(tmp_path, "commit", "-q", "--allow-empty", "-m", msg)
+        full = _git(tmp_path, "rev-parse", "HEAD~1", "HEAD").split()
+
+        assert resolve_revs_short(tmp_path, "HEAD~1", "HEAD") == [h[:12] for h in full]
+        with pytest.raises(subprocess.CalledProcessError) as exc_info:
+            resolve_revs_short(tmp_path, "typo123", "HEAD")
+        assert "typo123" in exc_info.value.stderr
 
 
 class TestGitWorktree:
-    def test_creates_and_removes_worktree(self, tmp_path):
-        with patch("patchlint.subprocess.run") as mock_run, \
-             patch("patchlint.tempfile.mkdtemp", return_value=str(tmp_path / "wt")):
-            mock_run.return_value = MagicMock(returncode=0)
-            (tmp_path / "wt").mkdir()
-
-            with git_worktree(tmp_path, "HEAD~1") as wt:
-                assert wt == tmp_path / "wt"
-
-            assert mock_run.call_count == 2
-            add_call = mock_run.call_args_list[0]
-            remove_call = mock_run.call_args_list[1]
-            assert "add" in add_call.args[0]
-            assert "--detach" in add_call.args[0]
-            assert "remove" in remove_call.args[0]
-
-    def test_removes_worktree_on_exception(self, tmp_path):
-        with patch("patchlint.subprocess.run") as mock_run, \
-             patch("patchlint.tempfile.mkdtemp", return_value=str(tmp_path / "wt")):
-            mock_run.return_value = MagicMock(returncode=0)
-            (tmp_path / "wt").mkdir()
-
-            with pytest.raises(RuntimeError):
-                with git_worktree(tmp_path, "HEAD~1") as wt:
-                    raise RuntimeError("boom")
-
-            remove_call = mock_run.call_args_list[-1]
-            assert "remove" in remove_call.args[0]
-
-    def test_worktree_creation_failure(self, tmp_path):
-        """Failed worktree add raises ClickException with git's error message."""
-        exc = subprocess.CalledProcessError(
-            128, "git", stderr="fatal: 'badrev' is not a commit\n"
+    @pytest.fixture
+    def wt_dir(self, tmp_path, monkeypatch):
+        wt = tmp_path / "wt"
+        wt.mkdir()
+        monkeypatch.setattr(patchlint.tempfile, "mkdtemp", lambda **k: str(wt))
+        return wt
+
+    @pytest.fixture
+    def stubs(self, monkeypatch):
+        """Record git commands, _populate_worktree calls and rmtree calls.
+
+        Set ``add_exc`` to make ``git worktree add`` raise it.
+        """
+        rec = SimpleNamespace(calls=[], populated=[], removed=[], add_exc=None)
+
+        def fake_run(cmd, **kwargs):
+            rec.calls.append(cmd)
+            if rec.add_exc is not None and "add" in cmd:
+                raise rec.add_exc
+            return SimpleNamespace(returncode=0)
+
+        monkeypatch.setattr(patchlint.subprocess, "run", fake_run)
+        monkeypatch.setattr(patchlint, "_populate_worktree", lambda *a: rec.populated.append(a))
+        monkeypatch.setattr(
+            patchlint.shutil, "rmtree", lambda path, **k: rec.removed.append((path, k)),
         )
-        with patch("patchlint.subprocess.run", side_effect=exc), \
-             patch("patchlint.tempfile.mkdtemp", return_value=str(tmp_path / "wt")), \
-             patch("patchlint.shutil.rmtree") as mock_rmtree:
-            (tmp_path / "wt").mkdir()
-            with pytest.raises(click.ClickException, match="failed to create worktree"):
-                with git_worktree(tmp_path, "badrev") as wt:
+        return rec
+
+    def test_creates_and_removes_worktree(self, tmp_path, wt_dir, stubs):
+        with git_worktree(tmp_path, "HEAD~1") as wt:
+            assert wt == wt_dir
+
+        add_cmd, remove_cmd = stubs.calls
+        assert "add" in add_cmd
+        assert "--detach" in add_cmd
+        assert "--no-checkout" in add_cmd
+        assert "remove" in remove_cmd
+        assert stubs.populated == [(tmp_path, wt_dir)]
+        assert stubs.removed == []
+
+    def test_removes_worktree_on_exception(self, tmp_path, wt_dir, stubs):
+        with pytest.raises(RuntimeError):
+            with git_worktree(tmp_path, "HEAD~1"):
+                raise RuntimeError("boom")
+
+        assert "remove" in stubs.calls[-1]
+        assert stubs.removed == []
+
+    def test_worktree_creation_failure(self, tmp_path, wt_dir, stubs):
+        """Failed worktree add raises ClickException with git's error message."""
+        stubs.add_exc = _BAD_COMMIT_EXC
+        with pytest.raises(click.ClickException, match="failed to create worktree"):
+            with git_worktree(tmp_path, "badrev"):
+                pass  # pragma: no cover
+        assert len(stubs.calls) == 1
+        assert stubs.populated == []
+        assert stubs.removed == [(wt_dir, {"ignore_errors": True})]
+
+    def test_populate_failure_removes_worktree(self, tmp_path, wt_dir, stubs, monkeypatch):
+        monkeypatch.setattr(patchlint, "_populate_worktree", _raise(_BAD_OBJECT_EXC))
+        with pytest.raises(click.ClickException, match="failed to check out worktree"):
+            with git_worktree(tmp_path, "HEAD~1"):
+                pass  # pragma: no cover
+        assert "remove" in stubs.calls[-1]
+
+
+class TestLockedWorkDir:
+    def test_stable_per_repo_path(self, tmp_path):
+        kernel = tmp_path / "linux"
+        with _locked_work_dir(kernel) as work:
+            assert work == tmp_path / ".patchlint-linux"
+        with _locked_work_dir(kernel) as again:
+            assert again == work
+
+    def test_second_run_refused(self, tmp_path):
+        kernel = tmp_path / "linux"
+        with _locked_work_dir(kernel):
+            with pytest.raises(click.ClickException, match="another patchlint run"):
+                with _locked_work_dir(kernel):
                     pass  # pragma: no cover
-            mock_rmtree.assert_called_once_with(tmp_path / "wt", ignore_errors=True)
+
+
+class TestPopulateWorktree:
+    """Runs real git: the clone/checkout split is easy to get subtly wrong."""
+
+    @pytest.fixture
+    def kernel(self, tmp_path):
+        k = tmp_path / "linux"
+        k.mkdir()
+        _git(k, "init", "-q")
+        (k / "sub").mkdir()
+        (k / "same.c").write_text("same\n")
+        (k / "sub" / "nested.c").write_text("nested\n")
+        (k / "changed.c").write_text("old\n")
+        (k / "deleted.c").write_text("gone\n")
+        (k / "run.sh").write_text("#!/bin/sh\n")
+        (k / "run.sh").chmod(0o755)
+        (k / "link.c").symlink_to("same.c")
+        _git(k, "add", "-A")
+        _git(k, "commit", "-qm", "base")
+        (k / "changed.c").write_text("new\n")
+        (k / "deleted.c").unlink()
+        (k / "added.c").write_text("added\n")
+        _git(k, "add", "-A")
+        _git(k, "commit", "-qm", "head")
+        return k
+
+    @pytest.fixture
+    def cloned(self, kernel, monkeypatch):
+        """Record the relative paths _populate_worktree clones from the main tree."""
+        paths = set()
+        real = patchlint._clone_file
+
+        def clone(src, dst):
+            real(src, dst)
+            paths.add(str(src.relative_to(kernel)))
+
+        monkeypatch.setattr(patchlint, "_clone_file", clone)
+        return paths
+
+    def test_baseline_contents(self, kernel, cloned):
+        with git_worktree(kernel, "HEAD~1") as wt:
+            files = sorted(
+                str(p.relative_to(wt)) for p in wt.rglob("*")
+                if not p.is_dir() and p.name != ".git"
+            )
+            assert files == [
+                "changed.c", "deleted.c", "link.c", "run.sh", "same.c", "sub/nested.c",
+            ]
+            assert (wt / "changed.c").read_text() == "old\n"
+            assert (wt / "link.c").readlink() == Path("same.c")
+            assert os.access(wt / "run.sh", os.X_OK)
+            # Only files identical in both revisions come from the main tree.
+            assert cloned == {"same.c", "run.sh", "sub/nested.c"}
+            # No stat-dirty entries: the index was refreshed after populating.
+            assert _git(wt, "diff-files", "--name-only") == ""
+            assert _git(wt, "status", "--porcelain") == ""
+
+    def test_head_clones_private_copies(self, kernel, cloned):
+        before = {p: (kernel / p).stat().st_ctime_ns for p in ("same.c", "run.sh")}
+        with git_worktree(kernel, "HEAD") as wt:
+            assert cloned == {"same.c", "changed.c", "added.c", "run.sh", "sub/nested.c"}
+            for name in cloned:
+                assert (wt / name).read_bytes() == (kernel / name).read_bytes()
+                assert (wt / name).stat().st_ino != (kernel / name).stat().st_ino
+        # Neither populating nor removing the worktree touched the main tree.
+        assert {p: (kernel / p).stat().st_ctime_ns for p in before} == before
+
+    def test_short_copy_falls_back_to_checkout(self, kernel, monkeypatch):
+        # The source ends after zero bytes, as if truncated mid-copy.
+        monkeypatch.setattr(patchlint.os, "copy_file_range", lambda *a: 0)
+        with git_worktree(kernel, "HEAD") as wt:
+            assert (wt / "same.c").read_text() == "same\n"
+            assert (wt / "sub" / "nested.c").read_text() == "nested\n"
+            assert _git(wt, "status", "--porcelain") == ""
+
+    def test_rewrites_clone_that_differs_from_index(self, kernel, monkeypatch):
+        """A clone of a file that changed under us is replaced from git."""
+        real = patchlint._clone_file
+
+        def clone(src, dst):
+            real(src, dst)
+            if src.name == "same.c":
+                dst.write_text("edited mid-run\n")
+
+        monkeypatch.setattr(patchlint, "_clone_file", clone)
+        with git_worktree(kernel, "HEAD") as wt:
+            assert (wt / "same.c").read_text() == "same\n"
+            assert _git(wt, "diff-files", "--name-only") == ""
+            assert _git(wt, "status", "--porcelain") == ""
+
+    @pytest.mark.parametrize("dir_left", [True, False])
+    def test_replaces_leftover_at_fixed_path(self, kernel, tmp_path, dir_left):
+        """An interrupted run's worktree, or its stale registration, is cleared."""
+        path = tmp_path / "work" / "candidate"
+        _git(kernel, "worktree", "add", "-q", "--detach", str(path), "HEAD~1")
+        (path / "junk.o").write_text("")
+        if not dir_left:
+            shutil.rmtree(path)
+
+        with git_worktree(kernel, "HEAD", path) as wt:
+            assert wt == path
+            assert (wt / "added.c").exists()
+            assert not (wt / "junk.o").exists()
+        assert not path.exists()
+        assert _git(kernel, "worktree", "list", "--porcelain").count("worktree ") == 1
@@ -1,95 +1,80 @@
 """Tests for test blurb generation."""
-from patchlint import generate_test_blurb
-
+import pytest
 
-class TestGenerateTestBlurb:
-    def test_all_clean(self):
-        blurb = generate_test_blurb(
-            parent_short="abc123def456",
-            allmod_new=[],
-            allyesconfig_new=[],
-            boot_ok=True,
-            uname_output="Linux (none) 6.12.0-rc1 #1 SMP x86_64 GNU/Linux",
-        )
-        assert "This patch was tested by:" in blurb
-        assert "allmodconfig: no new warnings" in blurb
-        assert "allyesconfig: no new warnings" in blurb
-        assert "compared to abc123def456" in blurb
-        assert "Booting defconfig kernel via vng and running `uname -a`:" in blurb
-        assert "  Linux (none) 6.12.0-rc1" in blurb
+from patchlint import generate_test_blurb
 
-    def test_new_warnings(self):
-        blurb = generate_test_blurb(
-            parent_short="abc123def456",
-            allmod_new=["drivers/foo.c:LINE:COL: warning: unused [-Wunused]"],
-            allyesconfig_new=[],
-            boot_ok=True,
-            uname_output="Linux 6.12.0",
-        )
-        assert "1 new warning(s)" in blurb
-        assert "allmodconfig" in blurb
-        assert "drivers/foo.c" in blurb
-        assert "allyesconfig: no new warnings" in blurb
 
-    def test_boot_failed(self):
-        blurb = generate_test_blurb(
-            parent_short="abc123def456",
-            allmod_new=[],
-            allyesconfig_new=[],
-            boot_ok=False,
-            uname_output="",
-        )
-        assert "FAILED" in blurb
-        assert "uname" not in blurb.split("FAILED")[1]
+def _kw(**overrides):
+    kwargs = dict(
+        parent_short="abc123def456",
+        allmod_new=[],
+        allyesconfig_new=[],
+        boot_ok=True,
+        uname_output="",
+    )
+    kwargs.update(overrides)
+    return kwargs
 
-    def test_no_uname_output(self):
-        blurb = generate_test_blurb(
-            parent_short="abc123def456",
-            allmod_new=[],
-            allyesconfig_new=[],
-            boot_ok=True,
-            uname_output="",
-        )
-        assert "OK" in blurb
-        assert "uname" not in blurb
 
-    def test_multiple_new_warnings(self):
-        blurb = generate_test_blurb(
-            parent_short="abc123def456",
-            allmod_new=[],
-            allyesconfig_new=[
-                "a.c:LINE:COL: warning: one",
-                "b.c:LINE:COL: warning: two",
+class TestGenerateTestBlurb:
+    @pytest.mark.parametrize("kwargs,expected,forbidden", [
+        pytest.param(
+            _kw(uname_output="Linux (none) 6.12.0-rc1 #1 SMP x86_64 GNU/Linux"),
+            [
+                "This patch was tested by:",
+                "allmodconfig: no new warnings",
+                "allyesconfig: no new warnings",
+                "compared to abc123def456",
+                "Booting defconfig kernel via vng and running `uname -a`:",
+                "  Linux (none) 6.12.0-rc1",
             ],
-            boot_ok=True,
-            uname_output="Linux 6.12.0",
-        )
-        assert "2 new warning(s)" in blurb
-        assert "    a.c" in blurb
-        assert "    b.c" in blurb
-
-    def test_multiple_commits(self):
-        blurb = generate_test_blurb(
-            parent_short="abc123def456",
-            allmod_new=[],
-            allyesconfig_new=[],
-            boot_ok=True,
-            uname_output="",
-            commit_count=3,
-        )
-        assert "This patch and those between it and abc123def456 were tested by:" in blurb
-
-    def test_single_commit(self):
-        blurb = generate_test_blurb(
-            parent_short="abc123def456",
-            allmod_new=[],
-            allyesconfig_new=[],
-            boot_ok=True,
-            uname_output="",
-            commit_count=1,
-        )
-        assert "This patch was tested by:" in blurb
-
-    def test_ends_with_newline(self):
-        blurb = generate_test_blurb("x", [], [], True, "")
+            [],
+            id="all_clean",
+        ),
+        pytest.param(
+            _kw(
+                allmod_new=["drivers/foo.c:LINE:COL: warning: unused [-Wunused]"],
+                uname_output="Linux 6.12.0",
+            ),
+            [
+                "allmodconfig: 1 new warning(s)",
+                "    drivers/foo.c",
+                "allyesconfig: no new warnings",
+            ],
+            [],
+            id="new_warnings",
+        ),
+        pytest.param(
+            _kw(
+                allyesconfig_new=[
+                    "a.c:LINE:COL: warning: one",
+                    "b.c:LINE:COL: warning: two",
+                ],
+                uname_output="Linux 6.12.0",
+            ),
+            ["allyesconfig: 2 new warning(s)", "    a.c", "    b.c"],
+            [],
+            id="multiple_new_warnings",
+        ),
+        pytest.param(_kw(boot_ok=False), ["vng: FAILED"], ["uname"], id="boot_failed"),
+        pytest.param(_kw(), ["vng: OK"], ["uname"], id="no_uname_output"),
+        pytest.param(
+            _kw(commit_count=3),
+            ["This patch and those between it and abc123def456 were tested by:"],
+            ["This patch was tested by:"],
+            id="multiple_commits",
+        ),
+        pytest.param(
+            _kw(commit_count=1),
+            ["This patch was tested by:"],
+            ["those between"],
+            id="single_commit",
+        ),
+    ])
+    def test_blurb_contents(self, kwargs, expected, forbidden):
+        blurb = generate_test_blurb(**kwargs)
+        for text in expected:
+            assert text in blurb
+        for text in forbidden:
+            assert text not in blurb
         assert blurb.endswith("\n")
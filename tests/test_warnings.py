@@ -1,6 +1,9 @@
 """Tests for warning regex, normalization, and comparison."""
 from pathlib import Path
 
+import pytest
+
+import patchlint
 from patchlint import (
     COMPILER_WARNING_RE,
     extract_normalized_warnings,
@@ -8,67 +11,76 @@ from patchlint import (
     compare_warnings,
 )
 
+FIXTURES = Path(__file__).parent / "fixtures"
 
-# --- COMPILER_WARNING_RE matching ---
-
-
-class TestCompilerWarningRE:
-    def test_gcc_format(self):
-        assert COMPILER_WARNING_RE.search("drivers/net/foo.c:123:45: warning: unused variable")
+# GCC colorized output: bold location, bold+magenta around "warning:".
+_ANSI_WARN = (
+    "\x1B[01m\x1B[Kfoo.c:10:2:\x1B[m\x1B[K"
+    " \x1B[01;35m\x1B[Kwarning:\x1B[m\x1B[K"
+    " unused variable 'x' [-Wunused-variable]"
+)
 
-    def test_clang_format(self):
-        assert COMPILER_WARNING_RE.search("arch/x86/mm/init.c:42:10: warning: implicit conversion [-Wconversion]")
 
-    def test_make_format(self):
-        assert COMPILER_WARNING_RE.search("Makefile:15: warning: overriding recipe for target")
+def _fixture_lines(name):
+    return (FIXTURES / name).read_text(errors="replace").splitlines()
 
-    def test_line_only_no_column(self):
-        assert COMPILER_WARNING_RE.search("fs/ext4/super.c:100: warning: old-style declaration")
 
-    def test_rejects_plain_text_with_warning_word(self):
-        assert not COMPILER_WARNING_RE.search("This is a warning about the build process")
+@pytest.fixture(scope="session")
+def allmod_lines():
+    return _fixture_lines("allmodconfig_warnings.log")
 
-    def test_rejects_error_line(self):
-        assert not COMPILER_WARNING_RE.search("drivers/foo.c:10:2: error: undeclared identifier")
 
-    def test_rejects_comment_line(self):
-        assert not COMPILER_WARNING_RE.search("# cmd: make allmodconfig")
+@pytest.fixture(scope="session")
+def clean_lines():
+    return _fixture_lines("clean_build.log")
 
-    def test_rejects_empty_line(self):
-        assert not COMPILER_WARNING_RE.search("")
 
-    def test_rejects_cc_progress_line(self):
-        assert not COMPILER_WARNING_RE.search("  CC      kernel/sched/fair.o")
+@pytest.fixture(scope="session")
+def gcc_error_lines():
+    return _fixture_lines("kernel_error_gcc.log")
 
 
-# --- normalize_warning_line ---
+# --- COMPILER_WARNING_RE matching ---
 
 
-class TestNormalizeWarningLine:
-    def test_strips_ansi(self):
-        raw = "\x1B[01;35mfoo.c:10:2: warning: bar\x1B[0m"
-        result = normalize_warning_line(raw)
-        assert "\x1B" not in result
-        assert "foo.c" in result
+class TestCompilerWarningRE:
+    @pytest.mark.parametrize("line,expected", [
+        # gcc
+        ("drivers/net/foo.c:123:45: warning: unused variable", True),
+        # clang
+        ("arch/x86/mm/init.c:42:10: warning: implicit conversion [-Wconversion]", True),
+        # make
+        ("Makefile:15: warning: overriding recipe for target", True),
+        # line only, no column
+        ("fs/ext4/super.c:100: warning: old-style declaration", True),
+        ("This is a warning about the build process", False),
+        ("drivers/foo.c:10:2: Warning: capitalized", False),
+        ("drivers/foo.c:10:2: error: undeclared identifier", False),
+        ("# cmd: make allmodconfig", False),
+        ("", False),
+        ("  CC      kernel/sched/fair.o", False),
+    ])
+    def test_match(self, line, expected):
+        assert bool(COMPILER_WARNING_RE.search(line)) == expected
 
-    def test_collapses_whitespace(self):
-        raw = "foo.c:10:2:   warning:    lots   of   space"
-        result = normalize_warning_line(raw)
-        assert "  " not in result
 
-    def test_normalizes_line_col(self):
-        result = normalize_warning_line("foo.c:123:45: warning: unused")
-        assert ":LINE:COL:" in result
-        assert ":123:" not in result
+# --- normalize_warning_line ---
 
-    def test_normalizes_line_only(self):
-        result = normalize_warning_line("foo.c:99: warning: old-style")
-        assert ":LINE:" in result
-        assert ":99:" not in result
 
-    def test_strips_dot_slash_prefix(self):
-        result = normalize_warning_line("./drivers/net/foo.c:10:2: warning: x")
-        assert result.startswith("drivers/")
+class TestNormalizeWarningLine:
+    @pytest.mark.parametrize("raw,expected", [
+        # strips ANSI colour codes
+        ("\x1B[01;35mfoo.c:10:2: warning: bar\x1B[0m", "foo.c:LINE:COL: warning: bar"),
+        (_ANSI_WARN, "foo.c:LINE:COL: warning: unused variable 'x' [-Wunused-variable]"),
+        # collapses whitespace
+        ("foo.c:10:2:   warning:    lots   of   space", "foo.c:LINE:COL: warning: lots of space"),
+        ("foo.c:123:45: warning: unused", "foo.c:LINE:COL: warning: unused"),
+        ("foo.c:99: warning: old-style", "foo.c:LINE: warning: old-style"),
+        # strips ./ prefix
+        ("./drivers/net/foo.c:10:2: warning: x", "drivers/net/foo.c:LINE:COL: warning: x"),
+    ])
+    def test_normalize(self, raw, expected):
+        assert normalize_warning_line(raw) == expected
 
 
 # --- extract_normalized_warnings ---
@@ -95,17 +107,15 @@ class TestExtractNormalizedWarnings:
 
     def test_ansi_colored_warning_extracted(self):
         """ANSI codes around 'warning:' should not prevent extraction."""
-        # Simulates GCC colorized output: bold+magenta around "warning:"
-        line = (
-            "\x1B[01m\x1B[Kfoo.c:10:2:\x1B[m\x1B[K"
-            " \x1B[01;35m\x1B[Kwarning:\x1B[m\x1B[K"
-            " unused variable 'x' [-Wunused-variable]"
-        )
-        result = extract_normalized_warnings([line])
+        result = extract_normalized_warnings([_ANSI_WARN])
         assert len(result) == 1
         assert "foo.c" in result[0]
         assert "unused variable" in result[0]
 
+    def test_uppercase_warning_not_extracted(self):
+        # gcc/clang/make always print lowercase "warning:".
+        assert extract_normalized_warnings(["foo.c:10:2: WARNING: shouty"]) == []
+
     def test_empty_input(self):
         assert extract_normalized_warnings([]) == []
 
@@ -113,51 +123,110 @@ class TestExtractNormalizedWarnings:
         lines = ["  CC      kernel/fork.o", "  LD      vmlinux"]
         assert extract_normalized_warnings(lines) == []
 
-    def test_fixture_allmodconfig(self):
-        fixture = Path(__file__).parent / "fixtures" / "allmodconfig_warnings.log"
-        warnings = extract_normalized_warnings(
-            fixture.read_text(errors="replace").splitlines()
-        )
+    def test_fixture_allmodconfig(self, allmod_lines):
+        warnings = extract_normalized_warnings(allmod_lines)
         assert len(warnings) == 4
 
-    def test_fixture_clean_build(self):
-        fixture = Path(__file__).parent / "fixtures" / "clean_build.log"
-        warnings = extract_normalized_warnings(
-            fixture.read_text(errors="replace").splitlines()
-        )
+    def test_fixture_clean_build(self, clean_lines):
+        warnings = extract_normalized_warnings(clean_lines)
         assert warnings == []
 
-    def test_fixture_kernel_error_gcc(self):
-        fixture = Path(__file__).parent / "fixtures" / "kernel_error_gcc.log"
-        warnings = extract_normalized_warnings(
-            fixture.read_text(errors="replace").splitlines()
-        )
+    def test_fixture_kernel_error_gcc(self, gcc_error_lines):
+        warnings = extract_normalized_warnings(gcc_error_lines)
         assert warnings == []
 
 
 # --- compare_warnings ---
 
 
+@pytest.fixture(scope="module")
+def logs_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("logs")
+
+
+def _write_logs(logs_dir, name, base_text, cand_text):
+    """Write a baseline/candidate pair under *name* and return their paths."""
+    base = logs_dir / f"{name}.base.log"
+    cand = logs_dir / f"{name}.cand.log"
+    base.write_text(base_text)
+    cand.write_text(cand_text)
+    return base, cand
+
+
+@pytest.fixture
+def pool_spy(monkeypatch):
+    """Record the kwargs of every ProcessPoolExecutor compare_warnings builds."""
+    calls = []
+    real = patchlint.ProcessPoolExecutor
+
+    def spy(*args, **kwargs):
+        calls.append(kwargs)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(patchlint, "ProcessPoolExecutor", spy)
+    return calls
+
+
 class TestCompareWarnings:
-    def test_no_new_warnings(self, tmp_path):
-        base = tmp_path / "base.log"
-        cand = tmp_path / "cand.log"
-        base.write_text("a.c:10:2: warning: foo\n")
-        cand.write_text("a.c:99:44: warning: foo\n")
+    def test_no_new_warnings(self, logs_dir):
+        base, cand = _write_logs(
+            logs_dir, "no_new_warnings",
+            "a.c:10:2: warning: foo\n",
+            "a.c:99:44: warning: foo\n",
+        )
         assert compare_warnings(base, cand) == []
 
-    def test_detects_new_warning(self, tmp_path):
-        base = tmp_path / "base.log"
-        cand = tmp_path / "cand.log"
-        base.write_text("a.c:10:2: warning: foo\n")
-        cand.write_text("a.c:10:2: warning: foo\nb.c:1:1: warning: bar\n")
+    def test_detects_new_warning(self, logs_dir):
+        base, cand = _write_logs(
+            logs_dir, "detects_new_warning",
+            "a.c:10:2: warning: foo\n",
+            "a.c:10:2: warning: foo\nb.c:1:1: warning: bar\n",
+        )
         new = compare_warnings(base, cand)
         assert len(new) == 1
         assert "bar" in new[0]
 
-    def test_removed_warning_not_flagged(self, tmp_path):
-        base = tmp_path / "base.log"
-        cand = tmp_path / "cand.log"
-        base.write_text("a.c:10:2: warning: foo\nb.c:1:1: warning: bar\n")
-        cand.write_text("a.c:10:2: warning: foo\n")
+    def test_removed_warning_not_flagged(self, logs_dir):
+        base, cand = _write_logs(
+            logs_dir, "removed_warning_not_flagged",
+            "a.c:10:2: warning: foo\nb.c:1:1: warning: bar\n",
+            "a.c:10:2: warning: foo\n",
+        )
         assert compare_warnings(base, cand) == []
+
+    def test_large_logs_use_processes(self, logs_dir, monkeypatch, pool_spy):
+        monkeypatch.setattr(patchlint, "PROCESS_SCAN_THRESHOLD", 0)
+        base, cand = _write_logs(
+            logs_dir, "large_logs_use_processes",
+            "a.c:10:2: warning: foo\n",
+            "a.c:10:2: warning: foo\nb.c:1:1: warning: bar\n",
+        )
+        new = compare_warnings(base, cand)
+        assert new == ["b.c:LINE:COL: warning: bar"]
+        assert pool_spy == [{"max_workers": 2}]
+
+    def test_chunked_scan_matches_serial(self, logs_dir, monkeypatch, pool_spy):
+        monkeypatch.setattr(patchlint, "PARALLEL_SCAN_THRESHOLD", 0)
+        lines = [f"f{i}.c:{i}:1: warning: w{i % 5}" for i in range(200)]
+        base, cand = _write_logs(
+            logs_dir, "chunked_scan_matches_serial",
+            "\n".join(lines[:100]) + "\n",
+            "\r\n".join(lines),  # no trailing newline
+        )
+        serial = sorted(
+            set(extract_normalized_warnings(lines))
+            - set(extract_normalized_warnings(lines[:100]))
+        )
+        assert len(serial) == 100
+        assert compare_warnings(base, cand) == serial
+        assert pool_spy == [{}, {}]  # one default-sized pool per log
+
+    def test_log_chunks_end_on_newlines(self, logs_dir):
+        log = logs_dir / "chunks.log"
+        log.write_bytes(b"aaaa\nbb\ncccccc\nd")
+        chunks = patchlint._log_chunks(log, 3)
+        assert chunks[0][0] == 0
+        assert chunks[-1][1] == log.stat().st_size
+        data = log.read_bytes()
+        for start, end in chunks[:-1]:
+            assert data[end - 1:end] == b"\n"